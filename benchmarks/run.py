@@ -0,0 +1,222 @@
+import gc
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import statistics
+import tracemalloc
+
+import numpy as np
+
+from ranking.catalog import RestaurantCatalog
+from ranking.exclusion import SeenRestaurantIndex
+from ranking.rule_based_models import MostLikedModel
+from ranking.samplers import NeighborhoodSampler, sample_from_pools
+from benchmarks.synthetic import (
+    SCALES,
+    make_restaurant_df,
+    make_user_df,
+    make_impression_lists,
+    make_candidate_pools,
+    make_training_batches,
+    make_guide_html,
+)
+
+# name -> setup(params, rng), setup builds the synthetic inputs and returns
+# the callable that is timed
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    def register(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+
+@benchmark('most_liked_fit')
+def most_liked_fit(params, rng):
+    restaurant_df = make_restaurant_df(params['n_restaurants'], params['n_neighborhoods'], rng)
+    batches = list(make_training_batches(
+        params['n_training_rows'], restaurant_df['restaurant_id'], rng
+    ))
+    return lambda: MostLikedModel().fit_batches(batches)
+
+
+@benchmark('neighborhood_inference')
+def neighborhood_inference(params, rng):
+    restaurant_df = make_restaurant_df(params['n_restaurants'], params['n_neighborhoods'], rng)
+    user_df = make_user_df(params['n_users'], params['n_neighborhoods'], rng)
+    return lambda: NeighborhoodSampler(restaurant_df, seed=0).sample(user_df, n=5, n_in_zip=2)
+
+
+@benchmark('neighborhood_inference_catalog')
+def neighborhood_inference_catalog(params, rng):
+    restaurant_df = make_restaurant_df(params['n_restaurants'], params['n_neighborhoods'], rng)
+    user_df = make_user_df(params['n_users'], params['n_neighborhoods'], rng)
+    catalog = RestaurantCatalog.build(
+        restaurant_df,
+        os.path.join(tempfile.mkdtemp(), 'catalog'),
+        'restaurant_id',
+        sort_by=['restaurant_neighborhood_id']
+    )
+    return lambda: NeighborhoodSampler.from_catalog(catalog, seed=0).sample(user_df, n=5, n_in_zip=2)
+
+
+@benchmark('sms_daily_rec_inference')
+def sms_daily_rec_inference(params, rng):
+    restaurant_df = make_restaurant_df(params['n_restaurants'], params['n_neighborhoods'], rng)
+    pools = make_candidate_pools(
+        params['n_users'], restaurant_df['restaurant_id'], params['pool_size'], rng
+    )
+    return lambda: sample_from_pools(pools, 1, np.random.default_rng(0))
+
+
+@benchmark('sms_impression_quality_inference')
+def sms_impression_quality_inference(params, rng):
+    restaurant_df = make_restaurant_df(params['n_restaurants'], params['n_neighborhoods'], rng)
+    eligible_ids = restaurant_df.loc[restaurant_df['rating'].between(4.5, 4.9), 'restaurant_id']
+    pools = make_candidate_pools(params['n_users'], eligible_ids, params['pool_size'], rng)
+    return lambda: sample_from_pools(pools, 5, np.random.default_rng(0))
+
+
+@benchmark('seen_index_sample_unseen')
+def seen_index_sample_unseen(params, rng):
+    restaurant_df = make_restaurant_df(params['n_restaurants'], params['n_neighborhoods'], rng)
+    seen_lists = make_impression_lists(
+        params['n_users'], restaurant_df['restaurant_id'], params['mean_impressions'], rng
+    )
+
+    def run():
+        seen_index = SeenRestaurantIndex(restaurant_df['restaurant_id'], seen_lists)
+        return seen_index.sample_unseen(5, np.random.default_rng(0))
+    return run
+
+
+def guide_parser(backend):
+    def setup(params, rng):
+        from scrapers.infatuation_parser import PARSER_BACKENDS
+
+        parse = PARSER_BACKENDS[backend]
+        pages = [make_guide_html(params['n_venues'], rng) for _ in range(params['n_guides'])]
+        return lambda: [parse(f'guide-{i}', page) for i, page in enumerate(pages)]
+    return setup
+
+
+benchmark('guide_parser_bs4')(guide_parser('bs4'))
+benchmark('guide_parser_lxml')(guide_parser('lxml'))
+
+
+def run_benchmark(name, params, repeat=5, seed=0, min_sample_seconds=0.2):
+    """
+    Time a benchmark repeat times, then run it once more under tracemalloc
+    for its peak traced memory
+
+    Each timing sample loops the benchmark for at least min_sample_seconds
+    and records the time per call, so millisecond benchmarks are not
+    dominated by timer and scheduler noise.
+    """
+    func = BENCHMARKS[name](params, np.random.default_rng(seed))
+    start = time.perf_counter()
+    func()
+    loops = max(1, int(min_sample_seconds / max(time.perf_counter() - start, 1e-9)))
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(loops):
+            func()
+        timings.append((time.perf_counter() - start) / loops)
+    # drop garbage left by the timed runs so it does not add to the peak
+    gc.collect()
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        'seconds_min': min(timings),
+        'seconds_median': statistics.median(timings),
+        'peak_traced_bytes': peak,
+    }
+
+
+def compare(results, baseline, threshold=1.5):
+    """
+    Names of benchmarks whose best time or peak memory grew by more than
+    threshold over the baseline run with the same parameters
+
+    Times are compared on the minimum over the repeats, the least noisy
+    estimate for millisecond scale benchmarks.
+    """
+    if baseline.get('params') != results['params']:
+        print("Baseline was run with different parameters, not comparing")
+        return []
+    regressions = []
+    for name, result in results['results'].items():
+        base = baseline['results'].get(name)
+        if base is None:
+            continue
+        time_ratio = result['seconds_min'] / max(base['seconds_min'], 1e-9)
+        memory_ratio = result['peak_traced_bytes'] / max(base['peak_traced_bytes'], 1)
+        regressed = time_ratio > threshold or memory_ratio > threshold
+        print(
+            f"{name}: {time_ratio:.2f}x time, {memory_ratio:.2f}x memory"
+            f"{' REGRESSION' if regressed else ''}"
+        )
+        if regressed:
+            regressions.append(name)
+    return regressions
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description='Run offline benchmarks on synthetic data')
+    parser.add_argument('--scale', default='small', choices=list(SCALES))
+    for param in SCALES['small']:
+        parser.add_argument(f"--{param.replace('_', '-')}", type=int, default=None)
+    parser.add_argument('--only', nargs='*', choices=list(BENCHMARKS), default=None)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=None, help='write results JSON here')
+    parser.add_argument('--baseline', default=None, help='results JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=1.5)
+    args = parser.parse_args()
+
+    params = dict(SCALES[args.scale])
+    for param in params:
+        if getattr(args, param) is not None:
+            params[param] = getattr(args, param)
+
+    results = {
+        'scale': args.scale,
+        'params': params,
+        'seed': args.seed,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'results': {},
+    }
+    for name in args.only or BENCHMARKS:
+        try:
+            result = run_benchmark(name, params, repeat=args.repeat, seed=args.seed)
+        except ImportError as e:
+            print(f"{name}: skipped, {e}")
+            continue
+        results['results'][name] = result
+        print(
+            f"{name}: {result['seconds_min']:.3f}s min, "
+            f"{result['seconds_median']:.3f}s median, "
+            f"{result['peak_traced_bytes'] / 2 ** 20:.1f} MiB peak"
+        )
+
+    if args.output is not None:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.baseline is not None:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+        if compare(results, baseline, threshold=args.threshold):
+            sys.exit(1)
@@ -0,0 +1,146 @@
+import numpy as np
+import pandas as pd
+
+# row counts per scale, any of them can be overridden from the command line
+SCALES = {
+    'small': {
+        'n_users': 10000,
+        'n_restaurants': 1000,
+        'n_neighborhoods': 50,
+        'mean_impressions': 20,
+        'pool_size': 200,
+        'n_training_rows': 200000,
+        'n_guides': 5,
+        'n_venues': 20,
+    },
+    'medium': {
+        'n_users': 500000,
+        'n_restaurants': 20000,
+        'n_neighborhoods': 200,
+        'mean_impressions': 50,
+        'pool_size': 500,
+        'n_training_rows': 5000000,
+        'n_guides': 20,
+        'n_venues': 40,
+    },
+    'large': {
+        'n_users': 5000000,
+        'n_restaurants': 200000,
+        'n_neighborhoods': 300,
+        'mean_impressions': 100,
+        'pool_size': 1000,
+        'n_training_rows': 50000000,
+        'n_guides': 50,
+        'n_venues': 60,
+    },
+}
+
+
+def zipf_weights(n, exponent=1.1):
+    """
+    Popularity weights, a few restaurants get most of the impressions
+    """
+    weights = 1.0 / np.arange(1, n + 1) ** exponent
+    return weights / weights.sum()
+
+
+def make_restaurant_df(n_restaurants, n_neighborhoods, rng):
+    """
+    Restaurant catalog with sparse ids, a neighborhood and a Google rating
+    """
+    restaurant_ids = np.sort(
+        rng.choice(n_restaurants * 10, size=n_restaurants, replace=False)
+    ).astype(np.int64)
+    neighborhood_ids = rng.choice(
+        n_neighborhoods, size=n_restaurants, p=zipf_weights(n_neighborhoods, 0.8)
+    )
+    ratings = np.round(rng.normal(4.3, 0.35, size=n_restaurants).clip(1, 5), 1)
+    return pd.DataFrame({
+        'restaurant_id': restaurant_ids,
+        'restaurant_neighborhood_id': neighborhood_ids,
+        'name': [f'restaurant {i}' for i in restaurant_ids],
+        'rating': ratings,
+    })
+
+
+def make_user_df(n_users, n_neighborhoods, rng):
+    """
+    Users with a home neighborhood, a few of them outside the catalog's
+    neighborhoods
+    """
+    return pd.DataFrame({
+        'user_id': np.arange(n_users, dtype=np.int64),
+        'user_neighborhood_id': rng.integers(0, n_neighborhoods + 2, size=n_users),
+    })
+
+
+def make_impression_lists(n_users, restaurant_ids, mean_impressions, rng):
+    """
+    Restaurant ids each user was shown, list lengths are Poisson and the
+    restaurants Zipf distributed
+    """
+    restaurant_ids = np.asarray(restaurant_ids)
+    weights = zipf_weights(len(restaurant_ids))[rng.permutation(len(restaurant_ids))]
+    sizes = rng.poisson(mean_impressions, size=n_users).clip(max=len(restaurant_ids) // 2)
+    flat = restaurant_ids[rng.choice(len(restaurant_ids), size=int(sizes.sum()), p=weights)]
+    return np.split(flat, np.cumsum(sizes)[:-1])
+
+
+def make_candidate_pools(n_users, restaurant_ids, pool_size, rng):
+    """
+    Sorted per-user candidate id arrays like the inference_candidates marts
+    """
+    restaurant_ids = np.asarray(restaurant_ids)
+    pool_size = min(pool_size, len(restaurant_ids))
+    sizes = rng.integers(pool_size // 2, pool_size + 1, size=n_users)
+    # contiguous windows of the sorted catalog keep generation vectorized
+    starts = rng.integers(0, len(restaurant_ids) - sizes + 1)
+    return [restaurant_ids[start:start + size] for start, size in zip(starts, sizes)]
+
+
+def make_training_batches(n_rows, restaurant_ids, rng, batch_size=1000000, like_rate=0.1):
+    """
+    Training table of (restaurant_id, label) rows in record batch sized
+    DataFrames
+    """
+    restaurant_ids = np.asarray(restaurant_ids)
+    weights = zipf_weights(len(restaurant_ids))
+    for start in range(0, n_rows, batch_size):
+        size = min(batch_size, n_rows - start)
+        yield pd.DataFrame({
+            'restaurant_id': restaurant_ids[rng.choice(len(restaurant_ids), size=size, p=weights)],
+            'label': (rng.random(size) < like_rate).astype(np.int64),
+        })
+
+
+def make_guide_html(n_venues, rng):
+    """
+    Guide page with the markup the Infatuation parser looks for
+    """
+    venues = []
+    items = []
+    for i in range(n_venues):
+        name = f'Restaurant {i}'
+        filler = ''.join(
+            f'<span class="styles_tag_{j}">tag {j}</span>' for j in range(rng.integers(10, 40))
+        )
+        venues.append(
+            f'<h2 class="flatplan_venue-heading styles_h2">{name}</h2>'
+            f'<p class="chakra-text css-0">Description of {name}</p>'
+            f'<div class="styles_venueContainer_x">'
+            f'<div class="flatplan_perfectFor_x"><span class="perfectForTag_a">Date Night</span>'
+            f'<span class="perfectForTag_a">Lunch</span></div><section>{filler}'
+            f'<span class="cuisineTag_a">Pizza</span><span class="neighborhoodTag_a">SoHo</span>'
+            f'<span data-price="{rng.integers(1, 5)}">$$</span></section></div>'
+        )
+        items.append(f'{{"name": "{name}", "item": {{"address": {{"name": "{i} Main St"}}}}}}')
+    navigation = '<div><p>navigation</p></div>' * 200
+    return (
+        '<html><body><span class="styles_title_x">Best Restaurants</span>'
+        '<div class="styles_contributorsList_x"><p>January 1, 2024</p></div>'
+        f'{navigation}<div class="styles_postContent_x flatplan_body_x">'
+        f'<p class="chakra-text css-0">Guide intro</p>{"".join(venues)}</div>'
+        '<script type="application/ld+json">{}</script>'
+        f'<script type="application/ld+json">{{"itemListElement": [{", ".join(items)}]}}</script>'
+        '</body></html>'
+    ).encode('utf-8')
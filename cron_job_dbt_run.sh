@@ -1,5 +1,7 @@
 #!/bin/bash
 source /home/mattgeorgedalton/miniconda3/etc/profile.d/conda.sh
 conda activate foodie
+cd /home/mattgeorgedalton/foodie-rec-sys/scrapers
+python place_tagger.py
 cd /home/mattgeorgedalton/foodie-rec-sys/data_warehouse
 dbt run
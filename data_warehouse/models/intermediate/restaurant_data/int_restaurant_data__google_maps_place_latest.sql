@@ -0,0 +1,27 @@
+{{
+  config(
+    materialized='incremental',
+    unique_key='place_id',
+    incremental_strategy='merge'
+  )
+}}
+
+-- latest scraped snapshot per place, only log rows newer than the
+-- watermark are merged on incremental runs
+--
+-- restaurant_data.google_maps_place_logs is created by the scraper's load
+-- jobs without partitioning or clustering, so the updated_at filter does not
+-- prune storage and each run still scans (and bills) the whole log table,
+-- the saving is in the merge. Recreating the log table partitioned by
+-- date(updated_at) would let BigQuery prune on the watermark.
+select
+  place_id,
+  name,
+  formatted_address,
+  rating as google_maps_rating,
+  updated_at
+from {{ ref('stg_restaurant_data__google_maps_place_logs') }}
+{% if is_incremental() %}
+where updated_at > (select max(updated_at) from {{ this }})
+{% endif %}
+qualify row_number() over (partition by place_id order by updated_at desc) = 1
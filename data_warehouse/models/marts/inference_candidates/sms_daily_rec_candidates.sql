@@ -0,0 +1,33 @@
+{{
+  config(
+    materialized='incremental',
+    incremental_strategy='insert_overwrite',
+    partition_by={'field': 'ds', 'data_type': 'date'}
+  )
+}}
+
+-- restaurants each user has not been sent over SMS yet, one sorted id
+-- array per user and day
+with users as (
+  select
+    a.id as user_id,
+    -- a NULL in the history would make NOT IN UNNEST NULL for every restaurant
+    array(
+      select restaurant_id
+      from unnest(b.engagement_sms_impression_restaurant_list) restaurant_id
+      where restaurant_id is not null
+    ) as seen_restaurant_ids
+  from {{ ref('stg_application__application_dim_user') }} a
+  left join {{ ref('stg_warehouse_feature_generation__application_engagement_features_v2') }} b
+  on a.id = b.user_id
+)
+
+
+select
+  current_date() as ds,
+  u.user_id,
+  ARRAY_AGG(r.id ORDER BY r.id) as candidate_restaurant_ids
+from users u
+cross join {{ ref('stg_application__application_dim_restaurant') }} r
+where r.id not in unnest(u.seen_restaurant_ids)
+group by 1, 2
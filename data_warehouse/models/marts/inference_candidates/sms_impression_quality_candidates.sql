@@ -0,0 +1,44 @@
+{{
+  config(
+    materialized='incremental',
+    incremental_strategy='insert_overwrite',
+    partition_by={'field': 'ds', 'data_type': 'date'}
+  )
+}}
+
+-- restaurants rated 4.5 to 4.9 on Google Maps that were not in a user's
+-- last 2 prediction lists, one sorted id array per user and day
+with users as (
+  select
+    a.user_id,
+    -- a NULL in the history would make NOT IN UNNEST NULL for every restaurant
+    array(
+      select restaurant_id
+      from unnest(b.engagement_sms_impression_restaurant_last_2_prediction_lists) restaurant_id
+      where restaurant_id is not null
+    ) as seen_restaurant_ids
+  from {{ ref('stg_application__user') }} a
+  left join {{ ref('stg_warehouse_feature_generation__application_engagement_features') }} b
+  on a.user_id = b.user_id
+),
+
+eligible_restaurants as (
+  select distinct
+    a.id
+  from {{ ref('stg_application__restaurant') }} a
+  left join {{ ref('stg_restaurant_data__google_maps_application_id_mapping') }} b
+  on a.id = b.application_id
+  left join {{ ref('stg_warehouse_feature_generation__google_maps_basic_features') }} c
+  on b.google_maps_id = c.restaurant_id
+  where c.restaurant_google_rating_float between 4.5 and 4.9
+)
+
+
+select
+  current_date() as ds,
+  u.user_id,
+  ARRAY_AGG(r.id ORDER BY r.id) as candidate_restaurant_ids
+from users u
+cross join eligible_restaurants r
+where r.id not in unnest(u.seen_restaurant_ids)
+group by 1, 2
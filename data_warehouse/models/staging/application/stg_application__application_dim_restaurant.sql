@@ -0,0 +1,3 @@
+select 
+    *
+from {{ source('application','dim_restaurant') }}
\ No newline at end of file
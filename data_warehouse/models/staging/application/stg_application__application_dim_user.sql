@@ -0,0 +1,3 @@
+select 
+    *
+from {{ source('application','dim_user') }}
\ No newline at end of file
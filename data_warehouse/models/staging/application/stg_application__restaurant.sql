@@ -0,0 +1,3 @@
+select 
+    *
+from {{ source('application','restaurant') }}
\ No newline at end of file
@@ -0,0 +1,3 @@
+select 
+    *
+from {{ source('application','user') }}
\ No newline at end of file
@@ -0,0 +1 @@
+select * from {{ source('restaurant_data','google_maps_application_id_mapping') }}
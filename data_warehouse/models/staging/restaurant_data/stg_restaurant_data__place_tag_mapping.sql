@@ -0,0 +1 @@
+select * from {{ source('restaurant_data','place_tag_mapping') }}
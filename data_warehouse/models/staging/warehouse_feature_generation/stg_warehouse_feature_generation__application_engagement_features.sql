@@ -0,0 +1,3 @@
+select 
+    *
+from {{ source('warehouse_feature_generation','application_engagement_features') }}
\ No newline at end of file
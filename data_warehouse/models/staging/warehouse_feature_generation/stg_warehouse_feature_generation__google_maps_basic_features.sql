@@ -0,0 +1,3 @@
+select 
+    *
+from {{ source('warehouse_feature_generation','google_maps_basic_features') }}
\ No newline at end of file
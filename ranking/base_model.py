@@ -1,9 +1,38 @@
+import pickle
 
 
 class RankingModel():
 
+    # training data columns read by the model, None for all columns
+    feature_columns = None
+    # file extension of the serialized model in the model store
+    artifact_format = 'pickle'
+
     def fit(self, *args, **kwargs):
         raise NotImplementedError()
 
+    def partial_fit(self, *args, **kwargs):
+        raise NotImplementedError()
+
+    def fit_batches(self, batches):
+        """
+        Fit on an iterable of training DataFrames, one partial_fit per batch
+        """
+        for batch in batches:
+            self.partial_fit(batch)
+        return self
+
     def predict(self, *args, **kwargs):
-        raise NotImplementedError()
\ No newline at end of file
+        raise NotImplementedError()
+
+    def to_bytes(self):
+        return pickle.dumps(self)
+
+    @classmethod
+    def from_bytes(cls, data):
+        return pickle.loads(data)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            return cls.from_bytes(f.read())
@@ -0,0 +1,153 @@
+import os
+import json
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from google.api_core import exceptions
+from google.cloud import bigquery
+
+from ranking.data_access import get_bigquery_client
+
+# table metadata is shared within a process, keyed by pid like the clients
+_tables = {}
+
+# streaming insert reasons a retry cannot fix
+NON_RETRYABLE_REASONS = {'invalid', 'invalidQuery', 'notFound', 'accessDenied'}
+
+
+class BulkWriter():
+    """
+    Writes JSON rows to BigQuery tables
+
+    Notes:
+    -rows are streamed in chunks bounded by max_rows_per_request and
+     max_bytes_per_request, chunks are sent concurrently
+    -rows that fail with a retryable reason are retried on their own with
+     exponential backoff, insert ids let BigQuery drop duplicates
+    -writes of more than load_job_threshold rows go through an NDJSON load
+     job instead of streaming
+    """
+
+    def __init__(self, client=None, project_id=None, location=None,
+                 max_rows_per_request=500, max_bytes_per_request=5 * 1024 * 1024,
+                 max_workers=4, max_retries=3, backoff_seconds=1.0,
+                 load_job_threshold=10000):
+        self.client = client or get_bigquery_client(project_id, location)
+        self.max_rows_per_request = max_rows_per_request
+        self.max_bytes_per_request = max_bytes_per_request
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.load_job_threshold = load_job_threshold
+
+    def get_table(self, table_id, schema=None):
+        """
+        Return table metadata for table_id, creating the table with schema
+        if it does not exist
+        """
+        key = (os.getpid(), self.client.project, table_id)
+        if key not in _tables:
+            try:
+                _tables[key] = self.client.get_table(table_id)
+            except exceptions.NotFound:
+                if schema is None:
+                    raise
+                if table_id.count('.') == 1:
+                    table_id = f'{self.client.project}.{table_id}'
+                table = bigquery.Table(table_id, schema=schema)
+                _tables[key] = self.client.create_table(table, exists_ok=True)
+                print(f"Created table {table_id}")
+        return _tables[key]
+
+    def chunk_rows(self, rows):
+        """
+        Split row indices into chunks within the request row and byte limits
+        """
+        chunks, chunk, chunk_bytes = [], [], 0
+        for i, row in enumerate(rows):
+            row_bytes = len(json.dumps(row, default=str))
+            if chunk and (len(chunk) >= self.max_rows_per_request
+                          or chunk_bytes + row_bytes > self.max_bytes_per_request):
+                chunks.append(chunk)
+                chunk, chunk_bytes = [], 0
+            chunk.append(i)
+            chunk_bytes += row_bytes
+        if chunk:
+            chunks.append(chunk)
+        return chunks
+
+    def _insert_chunk(self, table, rows, row_ids, indices):
+        """
+        Stream one chunk, returns errors with indices into rows
+        """
+        errors = []
+        for attempt in range(self.max_retries + 1):
+            try:
+                chunk_errors = self.client.insert_rows_json(
+                    table,
+                    [rows[i] for i in indices],
+                    row_ids=[row_ids[i] for i in indices]
+                )
+            except (exceptions.GoogleAPICallError, exceptions.RetryError) as e:
+                chunk_errors = [
+                    {'index': j, 'errors': [{'reason': 'requestError', 'message': str(e)}]}
+                    for j in range(len(indices))
+                ]
+            retry_indices = []
+            for error in chunk_errors:
+                index = indices[error['index']]
+                reasons = {e.get('reason') for e in error['errors']}
+                if reasons & NON_RETRYABLE_REASONS or attempt == self.max_retries:
+                    errors.append({**error, 'index': index})
+                else:
+                    retry_indices.append(index)
+            if not retry_indices:
+                break
+            indices = retry_indices
+            time.sleep(self.backoff_seconds * 2 ** attempt)
+        return errors
+
+    def insert_rows(self, table_id, rows, schema=None):
+        """
+        Stream rows into table_id, returns the errors of rows that could not
+        be inserted, with their index in rows
+        """
+        if not rows:
+            return []
+        if len(rows) > self.load_job_threshold:
+            return self.load_rows(table_id, rows, schema=schema)
+        table = self.get_table(table_id, schema=schema)
+        batch_id = uuid.uuid4().hex
+        row_ids = [f'{batch_id}-{i}' for i in range(len(rows))]
+        chunks = self.chunk_rows(rows)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            chunk_errors = list(executor.map(
+                lambda indices: self._insert_chunk(table, rows, row_ids, indices),
+                chunks
+            ))
+        return [error for errors in chunk_errors for error in errors]
+
+    def load_rows(self, table_id, rows, schema=None):
+        """
+        Append rows to table_id with an NDJSON load job, returns errors in
+        the format of insert_rows
+
+        A load job is atomic, so if it fails every row is returned as failed
+        with the job errors.
+        """
+        table = self.get_table(table_id, schema=schema)
+        job_config = bigquery.LoadJobConfig(
+            source_format=bigquery.SourceFormat.NEWLINE_DELIMITED_JSON,
+            write_disposition='WRITE_APPEND',
+            schema=table.schema,
+        )
+        try:
+            job = self.client.load_table_from_json(rows, table, job_config=job_config)
+            job.result()
+        except exceptions.GoogleAPICallError as e:
+            job_errors = getattr(e, 'errors', None) or [
+                {'reason': 'loadJobError', 'message': str(e)}
+            ]
+            return [{'index': i, 'errors': job_errors} for i in range(len(rows))]
+        return []
@@ -0,0 +1,236 @@
+import os
+import json
+import uuid
+import shutil
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+from ranking.constants import CATALOG_DIR_ENV_VAR, CATALOGS_KEPT
+
+
+def get_catalog_dir():
+    return os.environ.get(
+        CATALOG_DIR_ENV_VAR,
+        os.path.join(os.path.expanduser('~'), '.cache', 'foodie', 'catalogs')
+    )
+
+
+def get_catalog_key(df, id_column, sort_by=None):
+    """
+    Content key of the catalog built from df with id_column / sort_by
+    """
+    digest = hashlib.sha1()
+    digest.update(json.dumps([list(map(str, df.columns)), id_column, sort_by]).encode('utf-8'))
+    digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+class RestaurantCatalog():
+    """
+    Immutable column oriented catalog in memory mapped .npy files
+
+    Numeric columns are stored as typed arrays, all other columns are
+    dictionary encoded into int32 codes (-1 for missing) plus a dictionary,
+    strings as one utf-8 byte buffer with offsets. Every process that opens
+    the same catalog directory maps the same pages, so catalog data is shared
+    through the page cache instead of copied into each worker.
+
+    Notes:
+    -rows are ordered by the codes of sort_by, then by id
+    -a sorted copy of the ids is kept for id -> row position lookups
+    -a new build prunes catalog_dir down to the CATALOGS_KEPT most recently
+     used catalogs
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, 'meta.json'), 'r') as f:
+            self.meta = json.load(f)
+        self.n_rows = self.meta['n_rows']
+        self.id_column = self.meta['id_column']
+        self._arrays = {}
+
+    def _array(self, name):
+        if name not in self._arrays:
+            self._arrays[name] = np.load(
+                os.path.join(self.path, f'{name}.npy'), mmap_mode='r'
+            )
+        return self._arrays[name]
+
+    @property
+    def columns(self):
+        return list(self.meta['columns'])
+
+    def column(self, name):
+        """
+        Values of a numeric column, codes of an encoded one
+        """
+        if self.meta['columns'][name] == 'numeric':
+            return self._array(name)
+        return self.codes(name)
+
+    def codes(self, name):
+        return self._array(f'{name}.codes')
+
+    def dictionary(self, name):
+        """
+        Dictionary of an encoded column, decoded into memory
+        """
+        if self.meta['columns'][name] == 'encoded_numeric':
+            return np.asarray(self._array(f'{name}.dictionary'))
+        offsets = self._array(f'{name}.offsets')
+        data = self._array(f'{name}.data')
+        return np.array([
+            bytes(data[offsets[i]:offsets[i + 1]]).decode('utf-8')
+            for i in range(len(offsets) - 1)
+        ], dtype=object)
+
+    def decode(self, name, positions):
+        """
+        Values of column name at row positions, None for position -1
+        """
+        positions = np.asarray(positions, dtype=np.int64)
+        valid = positions >= 0
+        if self.meta['columns'][name] == 'numeric':
+            values = np.asarray(self._array(name)[positions[valid]])
+        else:
+            codes = np.asarray(self.codes(name)[positions[valid]])
+            if self.meta['columns'][name] == 'encoded_numeric':
+                dictionary = self._array(f'{name}.dictionary')
+                values = np.array([
+                    dictionary[code] if code >= 0 else None for code in codes
+                ], dtype=object)
+            else:
+                offsets = self._array(f'{name}.offsets')
+                data = self._array(f'{name}.data')
+                values = np.array([
+                    bytes(data[offsets[code]:offsets[code + 1]]).decode('utf-8')
+                    if code >= 0 else None
+                    for code in codes
+                ], dtype=object)
+        out = np.full(len(positions), None, dtype=object)
+        out[valid] = values
+        return out
+
+    def positions(self, ids):
+        """
+        Row positions of ids, -1 for ids not in the catalog
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        sorted_ids = self._array('_sorted_ids')
+        if len(sorted_ids) == 0:
+            return np.full(ids.shape, -1, dtype=np.int64)
+        position = np.minimum(np.searchsorted(sorted_ids, ids), len(sorted_ids) - 1)
+        found = sorted_ids[position] == ids
+        return np.where(found, self._array('_sorted_positions')[position], -1)
+
+    def to_dataframe(self, columns=None):
+        positions = np.arange(self.n_rows)
+        return pd.DataFrame({
+            name: self.decode(name, positions)
+            if self.meta['columns'][name] != 'numeric' else np.asarray(self._array(name))
+            for name in columns or self.columns
+        })
+
+    @classmethod
+    def build(cls, df, path, id_column, sort_by=None):
+        """
+        Write df as a catalog directory at path and open it
+        """
+        sort_by = sort_by or []
+        os.makedirs(path)
+        columns, codes = {}, {}
+        for name in df.columns:
+            values = df[name]
+            if name == id_column or (
+                pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values)
+                and name not in sort_by
+            ):
+                columns[name] = 'numeric'
+                continue
+            codes[name], dictionary = pd.factorize(values, sort=True)
+            if pd.api.types.is_numeric_dtype(dictionary.dtype):
+                columns[name] = 'encoded_numeric'
+                np.save(os.path.join(path, f'{name}.dictionary.npy'), np.asarray(dictionary))
+            else:
+                columns[name] = 'encoded_string'
+                encoded = [str(value).encode('utf-8') for value in dictionary]
+                offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+                offsets[1:] = np.cumsum([len(value) for value in encoded])
+                np.save(os.path.join(path, f'{name}.offsets.npy'), offsets)
+                np.save(
+                    os.path.join(path, f'{name}.data.npy'),
+                    np.frombuffer(b''.join(encoded), dtype=np.uint8)
+                )
+
+        ids = df[id_column].to_numpy(dtype=np.int64)
+        order = np.lexsort([ids] + [codes[name] for name in reversed(sort_by)])
+        for name, kind in columns.items():
+            if kind == 'numeric':
+                np.save(os.path.join(path, f'{name}.npy'), df[name].to_numpy()[order])
+            else:
+                np.save(
+                    os.path.join(path, f'{name}.codes.npy'),
+                    codes[name][order].astype(np.int32)
+                )
+        id_order = np.argsort(ids[order], kind='stable')
+        np.save(os.path.join(path, '_sorted_ids.npy'), ids[order][id_order])
+        np.save(os.path.join(path, '_sorted_positions.npy'), id_order.astype(np.int64))
+        with open(os.path.join(path, 'meta.json'), 'w') as f:
+            json.dump({
+                'n_rows': len(df),
+                'id_column': id_column,
+                'sort_by': sort_by,
+                'columns': columns,
+            }, f)
+        return cls(path)
+
+    @classmethod
+    def open_or_build(cls, key, load_df, id_column, sort_by=None, catalog_dir=None):
+        """
+        Open the catalog for key from catalog_dir, building it from
+        load_df() first if this host does not have it yet
+
+        Concurrent builders write to their own temporary directory and the
+        first rename wins, so workers only ever open complete catalogs.
+        """
+        catalog_dir = catalog_dir or get_catalog_dir()
+        path = os.path.join(catalog_dir, key)
+        if os.path.isdir(path):
+            # mark as recently used so prune keeps it
+            os.utime(path)
+        else:
+            os.makedirs(catalog_dir, exist_ok=True)
+            tmp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+            cls.build(load_df(), tmp_path, id_column, sort_by=sort_by)
+            try:
+                os.rename(tmp_path, path)
+            except OSError:
+                # another worker renamed its copy first
+                shutil.rmtree(tmp_path, ignore_errors=True)
+            else:
+                cls.prune(catalog_dir, keep=CATALOGS_KEPT)
+        return cls(path)
+
+    @staticmethod
+    def prune(catalog_dir=None, keep=CATALOGS_KEPT):
+        """
+        Remove all but the keep most recently used catalogs of catalog_dir,
+        returns the removed keys
+
+        Workers that still map a removed catalog keep reading it, the files
+        are only freed once they are unmapped.
+        """
+        catalog_dir = catalog_dir or get_catalog_dir()
+        if not os.path.isdir(catalog_dir):
+            return []
+        keys = [
+            name for name in os.listdir(catalog_dir)
+            if not name.endswith('.tmp') and os.path.isdir(os.path.join(catalog_dir, name))
+        ]
+        keys.sort(key=lambda name: os.path.getmtime(os.path.join(catalog_dir, name)), reverse=True)
+        for key in keys[keep:]:
+            shutil.rmtree(os.path.join(catalog_dir, key), ignore_errors=True)
+        return keys[keep:]
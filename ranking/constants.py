@@ -1 +1,14 @@
 MODEL_STORE = 'foodie_model_store'
+MODEL_CACHE_DIR_ENV_VAR = 'FOODIE_MODEL_CACHE_DIR'
+
+DATA_BACKEND_ENV_VAR = 'FOODIE_DATA_BACKEND'
+LOCAL_DATA_DIR_ENV_VAR = 'FOODIE_LOCAL_DATA_DIR'
+BLOB_STORE_ENV_VAR = 'FOODIE_BLOB_STORE'
+LOCAL_BLOB_DIR_ENV_VAR = 'FOODIE_LOCAL_BLOB_DIR'
+
+METRICS_DIR_ENV_VAR = 'FOODIE_METRICS_DIR'
+CATALOG_DIR_ENV_VAR = 'FOODIE_CATALOG_DIR'
+PARTITION_CACHE_DIR_ENV_VAR = 'FOODIE_PARTITION_CACHE_DIR'
+# catalogs and feature store partitions kept on disk after a successful build
+CATALOGS_KEPT = 3
+FEATURE_STORE_PARTITIONS_KEPT = 7
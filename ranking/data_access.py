@@ -0,0 +1,311 @@
+import os
+import glob
+import time
+
+import pandas as pd
+
+from ranking.constants import DATA_BACKEND_ENV_VAR, LOCAL_DATA_DIR_ENV_VAR
+
+# clients and backends are shared within a process, keyed by pid so a
+# forked worker never reuses its parent's connections
+_clients = {}
+_backends = {}
+
+
+def get_bigquery_client(project_id=None, location=None):
+    """
+    Return the process wide bigquery.Client for project_id / location
+    """
+    from google.cloud import bigquery
+
+    key = (os.getpid(), 'bigquery', project_id, location)
+    if key not in _clients:
+        _clients[key] = bigquery.Client(project=project_id, location=location)
+    return _clients[key]
+
+
+def get_bqstorage_client():
+    """
+    Return the process wide BigQuery Storage read client
+    """
+    from google.cloud import bigquery_storage
+
+    key = (os.getpid(), 'bigquery_storage')
+    if key not in _clients:
+        _clients[key] = bigquery_storage.BigQueryReadClient()
+    return _clients[key]
+
+
+def cast_to_schema(df, schema):
+    """
+    Return df with exactly the columns of schema, cast to their BigQuery types
+
+    schema is a list of SchemaField or of {"name", "type", "mode"} dicts,
+    REPEATED and RECORD columns are passed through as is.
+    """
+    out = pd.DataFrame(index=df.index)
+    for field in schema:
+        if isinstance(field, dict):
+            name, field_type, mode = field['name'], field['type'], field.get('mode')
+        else:
+            name, field_type, mode = field.name, field.field_type, field.mode
+        column = df[name] if name in df.columns else pd.Series(None, index=df.index, dtype=object)
+        if mode == 'REPEATED' or field_type in ('RECORD', 'STRUCT'):
+            out[name] = column
+        elif field_type in ('TIMESTAMP', 'DATETIME'):
+            out[name] = pd.to_datetime(column)
+        elif field_type == 'DATE':
+            out[name] = pd.to_datetime(column).dt.date
+        elif field_type in ('FLOAT', 'FLOAT64', 'NUMERIC', 'BIGNUMERIC'):
+            out[name] = pd.to_numeric(column).astype('float64')
+        elif field_type in ('INTEGER', 'INT64'):
+            out[name] = pd.to_numeric(column).astype('Int64')
+        elif field_type in ('BOOLEAN', 'BOOL'):
+            out[name] = column.astype('boolean')
+        else:
+            out[name] = column.astype(object).where(column.notna(), None)
+    return out
+
+
+class BigQueryBackend():
+    """
+    Reads query results through the BigQuery Storage read API as Arrow
+
+    Notes:
+    -stats for every query job run are kept in job_stats
+    """
+
+    def __init__(self, project_id=None, location=None):
+        self.client = get_bigquery_client(project_id, location)
+        self.bqstorage_client = get_bqstorage_client()
+        self.job_stats = []
+
+    def _run(self, query):
+        start = time.time()
+        job = self.client.query(query=query)
+        rows = job.result()
+        self.job_stats.append({
+            'job_id': job.job_id,
+            'total_bytes_processed': job.total_bytes_processed or 0,
+            'slot_millis': job.slot_millis or 0,
+            'total_rows': rows.total_rows or 0,
+            'seconds': time.time() - start,
+        })
+        return rows
+
+    def query(self, query):
+        """
+        Run query and return the result as a pandas DataFrame
+        """
+        return self._run(query).to_dataframe(
+            bqstorage_client=self.bqstorage_client
+        )
+
+    def query_arrow(self, query):
+        """
+        Run query and return the result as a pyarrow Table
+        """
+        return self._run(query).to_arrow(
+            bqstorage_client=self.bqstorage_client
+        )
+
+    def iter_record_batches(self, query):
+        """
+        Run query and yield the result as pyarrow RecordBatches
+        """
+        return self._run(query).to_arrow_iterable(
+            bqstorage_client=self.bqstorage_client
+        )
+
+    def list_partitions(self, table):
+        """
+        Return {ds: last modified unix millis} for the ds partitions of
+        table ('dataset.table' or 'project.dataset.table')
+
+        Read from INFORMATION_SCHEMA.PARTITIONS, so no table data is scanned.
+        Tables that are not partitioned by day fall back to their distinct ds
+        values, stamped None as their own modified times are unknown.
+        """
+        dataset, table_name = table.rsplit('.', 1)
+        query = f"""
+            select
+                partition_id,
+                unix_millis(last_modified_time) as last_modified
+            from `{dataset}.INFORMATION_SCHEMA.PARTITIONS`
+            where table_name = '{table_name}'
+        """
+        # unpartitioned tables have a single row with a NULL partition_id
+        partitions = {
+            f'{row.partition_id[:4]}-{row.partition_id[4:6]}-{row.partition_id[6:]}':
+            int(row.last_modified)
+            for row in self._run(query)
+            if row.partition_id and row.partition_id.isdigit() and len(row.partition_id) == 8
+        }
+        if partitions:
+            return partitions
+        query = f"""
+            select
+                cast(ds as string) as ds
+            from `{table}`
+            group by ds
+        """
+        return {row.ds: None for row in self._run(query)}
+
+    def get_last_modified(self, table):
+        """
+        Return the last modified unix millis of table, from table metadata
+        """
+        return int(self.client.get_table(table).modified.timestamp() * 1000)
+
+    def write_dataframe(self, df, table, schema=None,
+                        write_disposition='WRITE_APPEND'):
+        """
+        Load df into table ('dataset.table'), waiting for the load job
+        """
+        from google.cloud import bigquery
+
+        job_config = bigquery.LoadJobConfig()
+        job_config.write_disposition = write_disposition
+        if schema is not None:
+            job_config.schema = schema
+        job = self.client.load_table_from_dataframe(
+            df, table, job_config=job_config
+        )
+        return job.result()
+
+
+class LocalBackend():
+    """
+    Offline stand-in for BigQueryBackend, runs queries with DuckDB over
+    Parquet files
+
+    Tables are laid out as <root>/<dataset>/<table>.parquet or as a
+    <root>/<dataset>/<table>/ directory of Parquet files and are queryable
+    as dataset.table, so flow queries run unchanged.
+    """
+
+    def __init__(self, root):
+        import duckdb
+
+        self.root = root
+        self.connection = duckdb.connect()
+        self.job_stats = []
+        for path in glob.glob(os.path.join(root, '*', '*')):
+            dataset, table = path.split(os.sep)[-2:]
+            self._register(dataset, table.replace('.parquet', ''))
+
+    def _table_path(self, dataset, table):
+        return os.path.join(self.root, dataset, table)
+
+    def _register(self, dataset, table):
+        path = self._table_path(dataset, table)
+        if os.path.isdir(path):
+            source = os.path.join(path, '**', '*.parquet')
+        else:
+            source = path + '.parquet'
+        if not glob.glob(source, recursive=True):
+            return
+        self.connection.execute(f'create schema if not exists {dataset}')
+        self.connection.execute(
+            f"create or replace view {dataset}.{table} as "
+            f"select * from read_parquet('{source}', hive_partitioning=true)"
+        )
+
+    def _run(self, query):
+        start = time.time()
+        result = self.connection.execute(query)
+        self.job_stats.append({
+            'job_id': None,
+            'total_bytes_processed': 0,
+            'slot_millis': 0,
+            'total_rows': None,
+            'seconds': time.time() - start,
+        })
+        return result
+
+    def query(self, query):
+        return self._run(query).df()
+
+    def query_arrow(self, query):
+        return self._run(query).fetch_arrow_table()
+
+    def iter_record_batches(self, query, batch_size=100000):
+        reader = self._run(query).fetch_record_batch(batch_size)
+        for batch in reader:
+            yield batch
+
+    def list_partitions(self, table):
+        """
+        Return {ds: last modified unix millis} for the ds partitions of
+        table, using file modification times
+        """
+        dataset, table = table.split('.')[-2:]
+        path = self._table_path(dataset, table)
+        files = glob.glob(os.path.join(path, '**', '*.parquet'), recursive=True)
+        files += glob.glob(path + '.parquet')
+        if not files:
+            return {}
+        rows = self.query(f"""
+            select distinct
+                cast(ds as varchar) as ds,
+                filename
+            from read_parquet({files!r}, hive_partitioning=true, filename=true)
+        """)
+        partitions = {}
+        for row in rows.itertuples():
+            last_modified = int(os.path.getmtime(row.filename) * 1000)
+            partitions[row.ds] = max(partitions.get(row.ds, 0), last_modified)
+        return partitions
+
+    def get_last_modified(self, table):
+        """
+        Return the last modified unix millis of table, the newest file
+        modification time, None if the table has no files
+        """
+        dataset, table = table.split('.')[-2:]
+        path = self._table_path(dataset, table)
+        files = glob.glob(os.path.join(path, '**', '*.parquet'), recursive=True)
+        files += glob.glob(path + '.parquet')
+        if not files:
+            return None
+        return int(max(os.path.getmtime(f) for f in files) * 1000)
+
+    def write_dataframe(self, df, table, schema=None,
+                        write_disposition='WRITE_APPEND'):
+        dataset, table = table.split('.')[-2:]
+        path = self._table_path(dataset, table)
+        if write_disposition == 'WRITE_TRUNCATE':
+            for part in glob.glob(os.path.join(path, '*.parquet')):
+                os.remove(part)
+        os.makedirs(path, exist_ok=True)
+        df.to_parquet(os.path.join(path, f'part-{time.time_ns()}.parquet'))
+        self._register(dataset, table)
+
+
+def get_backends():
+    """
+    Return the data backends created so far in this process
+    """
+    pid = os.getpid()
+    return [backend for key, backend in _backends.items() if key[0] == pid]
+
+
+def get_backend(project_id=None, location=None):
+    """
+    Return the process wide data backend
+
+    Uses BigQuery unless FOODIE_DATA_BACKEND=local, in which case tables are
+    read from Parquet under FOODIE_LOCAL_DATA_DIR (default 'data').
+    """
+    backend_name = os.environ.get(DATA_BACKEND_ENV_VAR, 'bigquery')
+    key = (os.getpid(), backend_name, project_id, location)
+    if key not in _backends:
+        if backend_name == 'local':
+            _backends[key] = LocalBackend(
+                os.environ.get(LOCAL_DATA_DIR_ENV_VAR, 'data')
+            )
+        elif backend_name == 'bigquery':
+            _backends[key] = BigQueryBackend(project_id, location)
+        else:
+            raise ValueError(f"Unknown data backend: {backend_name}")
+    return _backends[key]
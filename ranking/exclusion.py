@@ -0,0 +1,164 @@
+import numpy as np
+
+
+# number of set bits in every possible byte
+POPCOUNT_TABLE = np.array(
+    [bin(i).count('1') for i in range(256)], dtype=np.uint8
+)
+
+
+class SeenRestaurantIndex():
+    """
+    Exclusion index of the restaurants each user has already been shown
+
+    Restaurant ids are mapped to dense ordinals (their position in the
+    catalog) and every user's impression list is stored once as sorted
+    ordinals. Packed bitmaps, one bit per catalog restaurant, are built from
+    that for block_size users at a time, so memory stays bounded by the
+    impression lists plus one block of bitmaps as the catalog grows.
+
+    Notes:
+    -bit o of a bitmap row lives in byte o >> 3 at position o & 7
+    -ids in an impression list that are not in the catalog are ignored
+    -the SMS flows sample from candidate pools precomputed in dbt, this
+     index covers exclusion in Python where no such mart exists
+    """
+
+    def __init__(self, restaurant_ids, seen_lists, block_size=4096):
+        self.restaurant_ids = np.asarray(restaurant_ids, dtype=np.int64)
+        self.n_restaurants = len(self.restaurant_ids)
+        self.n_bytes = (self.n_restaurants + 7) // 8
+        self.block_size = block_size
+        self._id_order = np.argsort(self.restaurant_ids, kind='stable')
+        self._sorted_ids = self.restaurant_ids[self._id_order]
+
+        seen_lists = [
+            np.asarray(x if x is not None else [], dtype=np.int64)
+            for x in seen_lists
+        ]
+        self.n_users = len(seen_lists)
+        rows = np.repeat(
+            np.arange(self.n_users, dtype=np.int64),
+            [len(x) for x in seen_lists]
+        )
+        ordinals = self.ordinals(
+            np.concatenate(seen_lists) if seen_lists else np.empty(0)
+        )
+        known = ordinals >= 0
+        # one sorted, de-duplicated key per (user, restaurant) pair
+        self.seen_keys = np.unique(
+            rows[known] * self.n_restaurants + ordinals[known]
+        )
+        self.indptr = np.searchsorted(
+            self.seen_keys,
+            np.arange(self.n_users + 1, dtype=np.int64) * self.n_restaurants
+        )
+
+    def ordinals(self, ids):
+        """
+        Map restaurant ids to catalog ordinals, -1 for unknown ids
+        """
+        ids = np.asarray(ids)
+        if self.n_restaurants == 0:
+            return np.full(ids.shape, -1, dtype=np.int64)
+        position = np.searchsorted(self._sorted_ids, ids)
+        position = np.minimum(position, self.n_restaurants - 1)
+        found = self._sorted_ids[position] == ids
+        return np.where(found, self._id_order[position], -1).astype(np.int64)
+
+    def is_seen(self, user_index, ordinals):
+        """
+        Check (user, restaurant ordinal) pairs against the index
+        """
+        keys = np.asarray(user_index, dtype=np.int64) * self.n_restaurants \
+            + np.asarray(ordinals, dtype=np.int64)
+        if len(self.seen_keys) == 0:
+            return np.zeros(keys.shape, dtype=bool)
+        position = np.searchsorted(self.seen_keys, keys)
+        position = np.minimum(position, len(self.seen_keys) - 1)
+        return self.seen_keys[position] == keys
+
+    def pack_mask(self, mask):
+        """
+        Pack a boolean mask over the catalog into a bitmap row
+        """
+        return np.packbits(np.asarray(mask, dtype=bool), bitorder='little')
+
+    def seen_bitmaps(self, start, stop):
+        """
+        Packed seen bitmaps for users [start, stop), shape
+        (stop - start, n_bytes)
+        """
+        bitmaps = np.zeros((stop - start, self.n_bytes), dtype=np.uint8)
+        keys = self.seen_keys[self.indptr[start]:self.indptr[stop]]
+        rows = keys // self.n_restaurants - start
+        ordinals = keys % self.n_restaurants
+        np.bitwise_or.at(
+            bitmaps,
+            (rows, ordinals >> 3),
+            np.left_shift(1, ordinals & 7).astype(np.uint8)
+        )
+        return bitmaps
+
+    def blocked_bitmaps(self, start, stop, eligible=None):
+        """
+        Bitmaps for users [start, stop) with a bit set for every restaurant
+        the user can not be recommended: seen, ineligible or padding
+        """
+        available = np.ones(self.n_bytes * 8, dtype=bool)
+        available[self.n_restaurants:] = False
+        if eligible is not None:
+            available[:self.n_restaurants] = eligible
+        return self.seen_bitmaps(start, stop) | ~self.pack_mask(available)
+
+    def sample_unseen(self, k, rng, eligible=None, dense_threshold=1 / 16):
+        """
+        Sample k distinct unseen (and eligible) restaurant ordinals per user
+
+        Candidates are drawn uniformly from the eligible restaurants and
+        rejected against the blocked bitmap, all pending users at once. Users
+        with less than dense_threshold of the eligible restaurants left are
+        sampled exactly from their free bits instead.
+
+        Returns a (n_users, k) array of ordinals. Raises ValueError if a
+        user has fewer than k restaurants left to recommend.
+        """
+        if eligible is None:
+            eligible_ordinals = np.arange(self.n_restaurants)
+        else:
+            eligible_ordinals = np.flatnonzero(eligible)
+        n_eligible = len(eligible_ordinals)
+        selection = np.full((self.n_users, k), -1, dtype=np.int64)
+        for start in range(0, self.n_users, self.block_size):
+            stop = min(start + self.block_size, self.n_users)
+            blocked = self.blocked_bitmaps(start, stop, eligible)
+            n_available = self.n_bytes * 8 \
+                - POPCOUNT_TABLE[blocked].sum(axis=1, dtype=np.int64)
+            if (n_available < k).any():
+                raise ValueError(
+                    f"{int((n_available < k).sum())} users have fewer than "
+                    f"{k} unseen eligible restaurants"
+                )
+            block_selection = selection[start:stop]
+
+            dense = n_available < dense_threshold * n_eligible
+            for row in np.flatnonzero(dense):
+                free = np.flatnonzero(~np.unpackbits(
+                    blocked[row], bitorder='little'
+                ).astype(bool))
+                block_selection[row] = rng.choice(free, size=k, replace=False)
+
+            for j in range(k):
+                pending = np.flatnonzero(~dense)
+                while pending.size > 0:
+                    candidate = eligible_ordinals[
+                        rng.integers(0, n_eligible, size=pending.size)
+                    ]
+                    byte = candidate >> 3
+                    bit = np.left_shift(1, candidate & 7).astype(np.uint8)
+                    free = (blocked[pending, byte] & bit) == 0
+                    accepted = pending[free]
+                    block_selection[accepted, j] = candidate[free]
+                    blocked[accepted, byte[free]] |= bit[free]
+                    pending = pending[~free]
+        return selection
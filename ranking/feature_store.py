@@ -0,0 +1,68 @@
+from ranking.constants import FEATURE_STORE_PARTITIONS_KEPT
+from ranking.partition_cache import PartitionCache
+
+FEATURE_STORE_DATASET = 'warehouse_feature_store'
+
+
+class FeatureStoreClient():
+    """
+    Reads feature store snapshots through a local per (table, ds) Parquet
+    cache
+
+    Notes:
+    -the latest ds is resolved from partition metadata instead of a
+     max(ds) subquery, and fetched only if it is not cached yet or changed
+    -partitions are not listed at all while the table last modified time is
+     not newer than the last sync, tables that are not partitioned by day
+     would otherwise be scanned for their ds values on every refresh
+    -after syncing the latest ds only the FEATURE_STORE_PARTITIONS_KEPT
+     newest cached partitions are kept
+    -an explicit ds that is already cached, or refresh=False, skips the
+     warehouse entirely, e.g. for backfills and local debugging
+    """
+
+    def __init__(self, project_id=None, cache_dir=None):
+        self.project_id = project_id
+        self.cache_dir = cache_dir
+
+    def get_cache(self, table):
+        return PartitionCache(
+            f'{FEATURE_STORE_DATASET}.{table}',
+            project_id=self.project_id,
+            cache_dir=self.cache_dir
+        )
+
+    def get(self, table, columns=None, ds=None, refresh=True):
+        """
+        Return partition ds (default the latest) of a feature store table as
+        a DataFrame
+        """
+        cache = self.get_cache(table)
+        cached = cache.cached_partitions()
+        table_last_modified = None
+        if ds is None:
+            use_warehouse = refresh or not cached
+            if use_warehouse:
+                # read before listing, a write in between is picked up next time
+                table_last_modified = cache.table_last_modified()
+                synced_at = cache.synced_at()
+                if cached and synced_at is not None and table_last_modified is not None:
+                    use_warehouse = table_last_modified > synced_at
+        else:
+            use_warehouse = ds not in cached
+        if use_warehouse:
+            partitions = cache.list_partitions()
+            if not partitions:
+                raise ValueError(f"{cache.table_id} has no partitions")
+            latest = ds is None
+            ds = ds or max(partitions)
+            if ds not in partitions:
+                raise ValueError(f"{cache.table_id} has no partition ds={ds}")
+            cache.sync({ds: partitions[ds]})
+            if latest:
+                cache.mark_synced(table_last_modified)
+                kept = sorted(cache.cached_partitions())[-FEATURE_STORE_PARTITIONS_KEPT:]
+                cache.prune(kept[0])
+        elif ds is None:
+            ds = max(cached)
+        return cache.read(ds, columns=columns)
@@ -0,0 +1,155 @@
+import os
+import json
+import uuid
+
+import pyarrow.parquet as pq
+
+from ranking.constants import PARTITION_CACHE_DIR_ENV_VAR
+from ranking.data_access import get_backend
+
+
+def get_partition_cache_dir():
+    return os.environ.get(
+        PARTITION_CACHE_DIR_ENV_VAR,
+        os.path.join(os.path.expanduser('~'), '.cache', 'foodie', 'partitions')
+    )
+
+
+class PartitionCache():
+    """
+    Local Parquet copies of the ds partitions of a warehouse table
+
+    Notes:
+    -each partition is stored as <cache_dir>/<dataset>/<table>/ds=<ds>.parquet
+     with a ds=<ds>.json sidecar holding the last modified time it was
+     fetched at
+    -a partition is fetched again only when the warehouse reports a newer
+     last modified time, files are written to a temporary name and renamed
+     so readers never see a partial copy
+    -partitions without a last modified time (tables not partitioned by
+     day) are only fetched when missing, a table wide time would make every
+     cached partition stale on each append
+    -table.json holds the table last modified time of the last full sync, so
+     callers can skip listing partitions while the table is unchanged
+    """
+
+    def __init__(self, table_id, project_id=None, cache_dir=None):
+        self.table_id = table_id
+        self.project_id = project_id
+        dataset, table = table_id.split('.')[-2:]
+        self.cache_dir = os.path.join(
+            cache_dir or get_partition_cache_dir(), dataset, table
+        )
+
+    def _path(self, ds, extension):
+        return os.path.join(self.cache_dir, f'ds={ds}.{extension}')
+
+    def list_partitions(self):
+        """
+        Return {ds: last modified} of the warehouse table, from metadata
+        """
+        return get_backend(self.project_id).list_partitions(self.table_id)
+
+    def table_last_modified(self):
+        """
+        Return the last modified time of the warehouse table, from metadata
+        """
+        return get_backend(self.project_id).get_last_modified(self.table_id)
+
+    def synced_at(self):
+        """
+        Return the table last modified time recorded by mark_synced, None if
+        the cache was never marked
+        """
+        path = os.path.join(self.cache_dir, 'table.json')
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r') as f:
+            return json.load(f)['last_modified']
+
+    def mark_synced(self, last_modified):
+        """
+        Record that the cache is up to date with the table as of last_modified
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = os.path.join(self.cache_dir, 'table.json')
+        tmp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'last_modified': last_modified}, f)
+        os.replace(tmp_path, path)
+
+    def cached_partitions(self):
+        """
+        Return {ds: last modified} of the partitions cached locally
+        """
+        if not os.path.isdir(self.cache_dir):
+            return {}
+        partitions = {}
+        for name in os.listdir(self.cache_dir):
+            if name.startswith('ds=') and name.endswith('.json'):
+                with open(os.path.join(self.cache_dir, name), 'r') as f:
+                    partitions[name[3:-5]] = json.load(f)['last_modified']
+        return partitions
+
+    def fetch(self, ds, last_modified):
+        """
+        Download partition ds from the warehouse into the cache
+        """
+        query = f"""
+            select
+                *
+            from {self.table_id}
+            where ds = '{ds}'
+        """
+        table = get_backend(self.project_id).query_arrow(query)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_suffix = f'{uuid.uuid4().hex}.tmp'
+        pq.write_table(table, f"{self._path(ds, 'parquet')}.{tmp_suffix}")
+        os.replace(f"{self._path(ds, 'parquet')}.{tmp_suffix}", self._path(ds, 'parquet'))
+        with open(f"{self._path(ds, 'json')}.{tmp_suffix}", 'w') as f:
+            json.dump({'last_modified': last_modified, 'num_rows': table.num_rows}, f)
+        os.replace(f"{self._path(ds, 'json')}.{tmp_suffix}", self._path(ds, 'json'))
+        print(f"Cached {self.table_id} ds={ds}, {table.num_rows} rows")
+
+    def sync(self, partitions):
+        """
+        Fetch the partitions of {ds: last modified} that are missing from
+        the cache or older than the warehouse copy, returns the fetched ds
+        """
+        cached = self.cached_partitions()
+        fetched = []
+        for ds, last_modified in sorted(partitions.items()):
+            if ds not in cached:
+                stale = True
+            elif last_modified is None:
+                stale = False
+            else:
+                stale = cached[ds] is None or cached[ds] < last_modified
+            if stale:
+                self.fetch(ds, last_modified)
+                fetched.append(ds)
+        return fetched
+
+    def prune(self, min_ds):
+        """
+        Remove the cached partitions older than min_ds, returns the removed ds
+        """
+        removed = sorted(ds for ds in self.cached_partitions() if ds < min_ds)
+        for ds in removed:
+            # sidecar first, a partition without one counts as not cached
+            os.remove(self._path(ds, 'json'))
+            os.remove(self._path(ds, 'parquet'))
+        return removed
+
+    def read(self, ds, columns=None):
+        """
+        Read a cached partition as a DataFrame
+        """
+        return pq.read_table(self._path(ds, 'parquet'), columns=columns).to_pandas()
+
+    def iter_batches(self, ds, columns=None, batch_size=100000):
+        """
+        Yield a cached partition as pyarrow RecordBatches
+        """
+        parquet_file = pq.ParquetFile(self._path(ds, 'parquet'))
+        return parquet_file.iter_batches(batch_size=batch_size, columns=columns)
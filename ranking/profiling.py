@@ -0,0 +1,88 @@
+import os
+import json
+import time
+import resource
+import functools
+
+import pandas as pd
+
+from ranking.constants import METRICS_DIR_ENV_VAR
+from ranking.data_access import get_backends
+
+
+def get_max_rss_bytes():
+    """
+    Peak resident set size of this process in bytes
+    """
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux
+    return max_rss * 1024
+
+
+def get_task_info(flow, step_name):
+    try:
+        from metaflow import current
+        return current.flow_name, str(current.run_id), step_name, str(current.task_id)
+    except Exception:
+        return flow.__class__.__name__, 'local', step_name, str(os.getpid())
+
+
+def profile_step(func):
+    """
+    Record run time metrics of a Metaflow step
+
+    Use it below @step. Wall and CPU time, the process's peak RSS, BigQuery
+    bytes processed, slot ms and rows of the query jobs run by the shared
+    data backends, and the row counts of DataFrame artifacts are stored as
+    the step_metrics artifact and written to
+    <FOODIE_METRICS_DIR>/<flow>/<run_id>/<step>-<task_id>.json
+    (default directory 'metrics').
+    """
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        job_stats_start = {
+            id(backend): len(backend.job_stats) for backend in get_backends()
+        }
+        wall_start = time.time()
+        cpu_start = time.process_time()
+        try:
+            return func(self, *args, **kwargs)
+        finally:
+            job_stats = [
+                stats
+                for backend in get_backends()
+                for stats in backend.job_stats[job_stats_start.get(id(backend), 0):]
+            ]
+            flow_name, run_id, step_name, task_id = get_task_info(self, func.__name__)
+            metrics = {
+                'flow': flow_name,
+                'run_id': run_id,
+                'step': step_name,
+                'task_id': task_id,
+                'wall_seconds': time.time() - wall_start,
+                'cpu_seconds': time.process_time() - cpu_start,
+                'max_rss_bytes': get_max_rss_bytes(),
+                'bq_jobs': len(job_stats),
+                'bq_total_bytes_processed': sum(s['total_bytes_processed'] for s in job_stats),
+                'bq_slot_millis': sum(s['slot_millis'] for s in job_stats),
+                'bq_rows_read': sum(s['total_rows'] or 0 for s in job_stats),
+                'bq_seconds': sum(s['seconds'] for s in job_stats),
+                'artifact_rows': {
+                    name: len(value) for name, value in vars(self).items()
+                    if not name.startswith('_') and isinstance(value, pd.DataFrame)
+                },
+            }
+            self.step_metrics = metrics
+            metrics_dir = os.path.join(
+                os.environ.get(METRICS_DIR_ENV_VAR, 'metrics'), flow_name, run_id
+            )
+            os.makedirs(metrics_dir, exist_ok=True)
+            with open(os.path.join(metrics_dir, f'{step_name}-{task_id}.json'), 'w') as f:
+                json.dump(metrics, f, indent=2)
+            print(
+                f"{step_name}: {metrics['wall_seconds']:.1f}s wall, "
+                f"{metrics['cpu_seconds']:.1f}s cpu, "
+                f"{metrics['max_rss_bytes'] / 2 ** 20:.0f} MiB peak rss, "
+                f"{metrics['bq_total_bytes_processed'] / 2 ** 20:.1f} MiB scanned"
+            )
+    return wrapper
@@ -0,0 +1,136 @@
+import os
+import re
+import time
+import collections
+
+import cachetools
+
+from ranking.base_model import RankingModel
+from ranking.constants import MODEL_STORE, MODEL_CACHE_DIR_ENV_VAR
+from ranking.storage import get_blob_store
+from ranking.utils import get_model_class
+
+# model store blobs are named <model_arch>_<ts>.<artifact_format>
+MODEL_NAME_PATTERN = re.compile(
+    r'^(?P<model_arch>.+)_(?P<ts>\d+)\.(?P<artifact_format>\w+)$'
+)
+
+ModelEntry = collections.namedtuple(
+    'ModelEntry', ['name', 'model_arch', 'ts', 'artifact_format', 'generation']
+)
+
+# loaded models shared by every registry in the process
+_models = cachetools.LRUCache(maxsize=8)
+
+
+class ModelRegistry():
+    """
+    Lists, resolves and loads models in the model store
+
+    Loaded models are cached twice: model files on local disk keyed by blob
+    name and generation, and model objects in a process wide in-memory LRU.
+    A model that was loaded on this host before is read from disk, not
+    downloaded.
+    """
+
+    def __init__(self, blob_store=None, cache_dir=None):
+        self.blob_store = blob_store or get_blob_store(MODEL_STORE)
+        self.cache_dir = cache_dir or os.environ.get(
+            MODEL_CACHE_DIR_ENV_VAR,
+            os.path.join(os.path.expanduser('~'), '.cache', 'foodie', 'models')
+        )
+
+    def _entry(self, name, generation):
+        match = MODEL_NAME_PATTERN.match(name)
+        if match is None:
+            return None
+        return ModelEntry(
+            name=name,
+            model_arch=match.group('model_arch'),
+            ts=int(match.group('ts')),
+            artifact_format=match.group('artifact_format'),
+            generation=generation,
+        )
+
+    def _cache_path(self, entry):
+        return os.path.join(self.cache_dir, f'{entry.generation}-{entry.name}')
+
+    def list_models(self, model_arch=None, offline=False):
+        """
+        List models in the store, oldest first, optionally for one model_arch
+
+        With offline=True only models already in the disk cache are listed.
+        """
+        if offline:
+            infos = []
+            if os.path.isdir(self.cache_dir):
+                for file_name in os.listdir(self.cache_dir):
+                    generation, _, name = file_name.partition('-')
+                    if generation.isdigit():
+                        infos.append((name, int(generation)))
+        else:
+            infos = [
+                (info.name, info.generation)
+                for info in self.blob_store.list_blobs()
+            ]
+        entries = [self._entry(name, generation) for name, generation in infos]
+        entries = [
+            entry for entry in entries if entry is not None and (
+                model_arch is None or entry.model_arch == model_arch.lower()
+            )
+        ]
+        return sorted(entries, key=lambda entry: (entry.ts, entry.generation))
+
+    def resolve(self, model_arch, offline=False):
+        """
+        Resolve the latest model for model_arch
+        """
+        entries = self.list_models(model_arch, offline=offline)
+        if not entries:
+            raise LookupError(f"No model found for {model_arch}")
+        return entries[-1]
+
+    def register(self, model, model_arch):
+        """
+        Upload a trained model to the store and return its blob name
+        """
+        name = f"{model_arch.lower()}_{int(time.time())}.{model.artifact_format}"
+        self.blob_store.upload(name, model.to_bytes())
+        return name
+
+    def load(self, model_arch=None, name=None, offline=False):
+        """
+        Load a model by blob name, or the latest model for model_arch
+        """
+        if name is not None:
+            if offline:
+                entries = [
+                    entry for entry in self.list_models(offline=True)
+                    if entry.name == name
+                ]
+            else:
+                info = self.blob_store.get_info(name)
+                entries = [] if info is None else [
+                    self._entry(info.name, info.generation)
+                ]
+            if not entries:
+                raise LookupError(f"No model named {name}")
+            entry = entries[-1]
+        else:
+            entry = self.resolve(model_arch, offline=offline)
+
+        key = (entry.name, entry.generation)
+        if key not in _models:
+            path = self._cache_path(entry)
+            if not os.path.exists(path):
+                os.makedirs(self.cache_dir, exist_ok=True)
+                data = self.blob_store.download(entry.name, generation=entry.generation)
+                with open(path + '.tmp', 'wb') as f:
+                    f.write(data)
+                os.replace(path + '.tmp', path)
+            model_class = get_model_class(entry.model_arch)
+            if entry.artifact_format != model_class.artifact_format:
+                # models saved before the arch had its own format are pickles
+                model_class = RankingModel
+            _models[key] = model_class.load(path)
+        return _models[key]
@@ -1,14 +1,87 @@
+import io
+
+import numpy as np
+import pandas as pd
+
 from ranking.base_model import RankingModel
 
+# fitted state of MostLikedModel, one row per liked restaurant
+LIKE_RANKING_DTYPE = np.dtype([
+    ('restaurant_id', '<i8'),
+    ('like_count', '<i8'),
+])
+
 class MostLikedModel(RankingModel):
+    """
+    Ranks restaurants by number of likes in the training data
+
+    The fitted state is a single typed array of (restaurant_id, like_count)
+    sorted by like count, ties broken by restaurant_id, and is saved as-is in
+    .npy format so it can be memory mapped and sliced on load.
+    """
+
+    feature_columns = ['restaurant_id', 'label']
+    artifact_format = 'npy'
     
-    def __init__(self):
-        self.most_like_restaurant_id_list = None
+    def __init__(self, ranking=None):
+        if ranking is None:
+            ranking = np.empty(0, dtype=LIKE_RANKING_DTYPE)
+        self.ranking = ranking
     
     def fit(self, df):
-        self.most_like_restaurant_id_list = \
-            df.loc[df['label']==1].groupby('restaurant_id').apply(lambda x: x['label'].sum()).index.tolist()
+        self.ranking = np.empty(0, dtype=LIKE_RANKING_DTYPE)
+        self.partial_fit(df)
+        return self
+
+    def partial_fit(self, df):
+        liked_ids = df.loc[df['label'] == 1, 'restaurant_id'].to_numpy(dtype=np.int64)
+        like_counts = pd.Series(liked_ids).value_counts(sort=False)
+        if len(self.ranking) > 0:
+            like_counts = like_counts.add(
+                pd.Series(self.ranking['like_count'], index=self.ranking['restaurant_id']),
+                fill_value=0
+            )
+        restaurant_ids = like_counts.index.to_numpy(dtype=np.int64)
+        counts = like_counts.to_numpy(dtype=np.int64)
+        order = np.lexsort((restaurant_ids, -counts))
+        ranking = np.empty(len(order), dtype=LIKE_RANKING_DTYPE)
+        ranking['restaurant_id'] = restaurant_ids[order]
+        ranking['like_count'] = counts[order]
+        self.ranking = ranking
+        return self
+
+    def top_k(self, k=None):
+        """
+        Top k rows of the ranking with their like counts, as a view
+        """
+        return self.ranking[:k]
         
-    def predict(self):
-        return self.most_like_restaurant_id_list
-        
\ No newline at end of file
+    def predict(self, k=None):
+        return self.top_k(k)['restaurant_id'].tolist()
+
+    @property
+    def most_like_restaurant_id_list(self):
+        return self.predict()
+
+    def __setstate__(self, state):
+        # models pickled before the ranking array only kept the id list
+        if 'ranking' not in state:
+            ids = state.pop('most_like_restaurant_id_list') or []
+            ranking = np.zeros(len(ids), dtype=LIKE_RANKING_DTYPE)
+            ranking['restaurant_id'] = ids
+            state['ranking'] = ranking
+        self.__dict__.update(state)
+
+    def to_bytes(self):
+        buffer = io.BytesIO()
+        np.save(buffer, self.ranking, allow_pickle=False)
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data):
+        return cls(np.load(io.BytesIO(data), allow_pickle=False))
+
+    @classmethod
+    def load(cls, path):
+        return cls(np.load(path, mmap_mode='r', allow_pickle=False))
+
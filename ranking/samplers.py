@@ -0,0 +1,172 @@
+import numpy as np
+import pandas as pd
+
+
+def sample_positions(pool_sizes, sample_sizes, rng):
+    """
+    Draw sample_sizes[i] distinct positions from range(pool_sizes[i]) for
+    every row i at once
+
+    Each of the k draws picks uniformly among the positions a row has not
+    taken yet and then shifts past the taken ones, so the cost is
+    O(rows * k^2) no matter how large the pools are.
+
+    Returns a (rows, max k) int64 array in draw order, padded with -1 where a
+    row asked for fewer positions (or its pool ran out).
+    """
+    pool_sizes = np.asarray(pool_sizes, dtype=np.int64)
+    sample_sizes = np.clip(
+        np.asarray(sample_sizes, dtype=np.int64), 0, pool_sizes
+    )
+    n_rows = pool_sizes.shape[0]
+    k_max = int(sample_sizes.max()) if n_rows > 0 else 0
+    drawn = np.full((n_rows, k_max), -1, dtype=np.int64)
+    # positions taken so far, kept sorted per row
+    taken = np.empty((n_rows, 0), dtype=np.int64)
+    for j in range(k_max):
+        active = sample_sizes > j
+        position = rng.integers(0, np.where(active, pool_sizes - j, 1))
+        for col in range(j):
+            position += position >= taken[:, col]
+        drawn[:, j] = np.where(active, position, -1)
+        taken = np.sort(np.column_stack([taken, position]), axis=1)
+    return drawn
+
+
+def shuffle_rows(selection, rng):
+    """
+    Shuffle the valid (non-negative) entries of each row of a padded
+    selection matrix, moving the -1 padding to the end of the row
+    """
+    keys = rng.random(selection.shape)
+    keys[selection < 0] = np.inf
+    order = np.argsort(keys, axis=1)
+    return np.take_along_axis(selection, order, axis=1)
+
+
+def sample_from_pools(pools, k, rng):
+    """
+    Sample k distinct ids from every row's candidate pool
+
+    pools holds one id array per row, e.g. the candidate_restaurant_ids of a
+    precomputed candidate mart. The pools are concatenated once and sampled
+    by position for all rows together.
+
+    Returns a (rows, k) int64 array of ids in draw order. Raises ValueError
+    if a pool has fewer than k ids.
+    """
+    pools = [
+        np.asarray(pool if pool is not None else [], dtype=np.int64)
+        for pool in pools
+    ]
+    pool_sizes = np.array([len(pool) for pool in pools], dtype=np.int64)
+    if (pool_sizes < k).any():
+        raise ValueError(
+            f"{int((pool_sizes < k).sum())} rows have fewer than {k} candidates"
+        )
+    if not pools:
+        return np.empty((0, k), dtype=np.int64)
+    flat = np.concatenate(pools)
+    offsets = np.cumsum(pool_sizes) - pool_sizes
+    positions = sample_positions(pool_sizes, np.full(len(pools), k), rng)
+    return flat[offsets[:, None] + positions]
+
+
+class NeighborhoodSampler():
+    """
+    Batched candidate sampler for neighborhood based rec lists
+
+    Restaurants are grouped by restaurant_neighborhood_id once, so each
+    neighborhood is a contiguous block of a sorted id array. For every user
+    the in-neighborhood picks are drawn from the user's block and the
+    out-of-neighborhood picks from the positions around it, for all users
+    together.
+    """
+
+    def __init__(self, restaurant_df, seed=None):
+        codes, neighborhood_ids = pd.factorize(
+            restaurant_df['restaurant_neighborhood_id']
+        )
+        order = np.argsort(codes, kind='stable')
+        self._set_blocks(
+            restaurant_df['restaurant_id'].to_numpy()[order],
+            codes[order],
+            neighborhood_ids,
+            seed
+        )
+
+    @classmethod
+    def from_catalog(cls, catalog, seed=None):
+        """
+        Sampler over a RestaurantCatalog sorted by restaurant_neighborhood_id
+
+        The catalog rows already are the neighborhood blocks, so its memory
+        mapped id column is used in place instead of a per-process copy.
+        """
+        if catalog.meta['sort_by'] != ['restaurant_neighborhood_id']:
+            raise ValueError("catalog is not sorted by restaurant_neighborhood_id")
+        sampler = cls.__new__(cls)
+        sampler._set_blocks(
+            catalog.column(catalog.id_column),
+            catalog.codes('restaurant_neighborhood_id'),
+            catalog.dictionary('restaurant_neighborhood_id'),
+            seed
+        )
+        return sampler
+
+    def _set_blocks(self, restaurant_ids, sorted_codes, neighborhood_ids, seed):
+        self.restaurant_ids = restaurant_ids
+        self.neighborhood_index = pd.Index(neighborhood_ids)
+        # restaurants without a neighborhood (code -1) sort to the front
+        n_unassigned = int(np.searchsorted(sorted_codes, 0))
+        sizes = np.bincount(
+            sorted_codes[n_unassigned:], minlength=len(neighborhood_ids)
+        )
+        starts = n_unassigned + np.cumsum(sizes) - sizes
+        # trailing empty block, looked up for users in unknown neighborhoods
+        self.neighborhood_sizes = np.append(sizes, 0).astype(np.int64)
+        self.neighborhood_starts = np.append(starts, 0).astype(np.int64)
+        self.rng = np.random.default_rng(seed)
+
+    def sample(self, user_df, n, n_in_zip):
+        """
+        Sample a rec list of up to n restaurants per user, up to n_in_zip of
+        them from the user's neighborhood
+
+        Returns a DataFrame with user_id and restaurant_list columns, in
+        user_df order.
+        """
+        neighborhood = self.neighborhood_index.get_indexer(
+            user_df['user_neighborhood_id']
+        )
+        in_pool = self.neighborhood_sizes[neighborhood]
+        in_start = self.neighborhood_starts[neighborhood]
+        out_pool = len(self.restaurant_ids) - in_pool
+
+        n_in = np.minimum(n_in_zip, in_pool)
+        n_out = np.maximum(n - n_in, n - n_in_zip)
+        in_selection = sample_positions(in_pool, n_in, self.rng)
+        out_selection = sample_positions(out_pool, n_out, self.rng)
+        # map block-relative positions back onto the sorted id array
+        in_selection = np.where(
+            in_selection >= 0, in_selection + in_start[:, None], -1
+        )
+        out_selection = np.where(
+            out_selection >= in_start[:, None],
+            out_selection + in_pool[:, None],
+            out_selection
+        )
+
+        selection = shuffle_rows(
+            np.hstack([in_selection, out_selection]), self.rng
+        )
+        list_sizes = (selection >= 0).sum(axis=1)
+        restaurant_ids = self.restaurant_ids[np.maximum(selection, 0)]
+        restaurant_lists = [
+            row[:size] for row, size
+            in zip(restaurant_ids.tolist(), list_sizes.tolist())
+        ]
+        return pd.DataFrame({
+            'user_id': user_df['user_id'].to_numpy(),
+            'restaurant_list': restaurant_lists,
+        })
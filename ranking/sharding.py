@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+
+
+def get_shards(keys, n_shards):
+    """
+    Stable hash partition of integer keys into n_shards shards
+
+    Keys go through the splitmix64 finalizer first, so consecutive ids spread
+    evenly and a key lands in the same shard on every run and host.
+    """
+    x = np.asarray(keys, dtype=np.int64).astype(np.uint64)
+    with np.errstate(over='ignore'):
+        x = (x ^ (x >> np.uint64(30))) * np.uint64(0xbf58476d1ce4e5b9)
+        x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94d049bb133111eb)
+        x = x ^ (x >> np.uint64(31))
+    return (x % np.uint64(n_shards)).astype(np.int64)
+
+
+def split_shards(df, key_column, n_shards):
+    """
+    Split df into n_shards DataFrames by the hash of key_column, rows keep
+    their df order
+    """
+    if n_shards == 1:
+        return [df]
+    shards = get_shards(df[key_column], n_shards)
+    return [df[shards == shard] for shard in range(n_shards)]
+
+
+def shard_artifact(name, shard):
+    """
+    Name of the artifact holding shard of a per-shard artifact name
+
+    Metaflow loads artifacts lazily, so a foreach task that reads only its
+    own shard artifact never loads the other shards.
+    """
+    return f'{name}_shard_{shard}'
+
+
+def concat_shards(inputs, attribute):
+    """
+    Concatenate a DataFrame artifact over the tasks of a foreach join,
+    ordered by their shard artifact
+    """
+    tasks = sorted(inputs, key=lambda task: task.shard)
+    return pd.concat(
+        [getattr(task, attribute) for task in tasks], ignore_index=True
+    )
@@ -0,0 +1,160 @@
+import os
+import glob
+import collections
+
+from ranking.constants import BLOB_STORE_ENV_VAR, LOCAL_BLOB_DIR_ENV_VAR
+
+BlobInfo = collections.namedtuple('BlobInfo', ['name', 'generation', 'size'])
+
+# storage clients are shared within a process, keyed by pid
+_clients = {}
+
+
+class PreconditionFailed(Exception):
+    """
+    Raised when an if_generation_match precondition does not hold
+    """
+
+
+def get_storage_client():
+    """
+    Return the process wide google.cloud.storage.Client
+    """
+    from google.cloud import storage
+
+    key = os.getpid()
+    if key not in _clients:
+        _clients[key] = storage.Client()
+    return _clients[key]
+
+
+class GCSBlobStore():
+    """
+    Blob access for one GCS bucket
+    """
+
+    def __init__(self, bucket_name):
+        self.bucket = get_storage_client().bucket(bucket_name)
+
+    def list_blobs(self, prefix=None):
+        return [
+            BlobInfo(blob.name, blob.generation, blob.size)
+            for blob in self.bucket.list_blobs(prefix=prefix)
+        ]
+
+    def get_info(self, name):
+        """
+        BlobInfo for name, None if the blob does not exist
+        """
+        blob = self.bucket.get_blob(name)
+        if blob is None:
+            return None
+        return BlobInfo(blob.name, blob.generation, blob.size)
+
+    def download(self, name, generation=None):
+        """
+        Download a blob as bytes, pinned to generation if given
+        """
+        blob = self.bucket.blob(name, generation=generation)
+        return blob.download_as_bytes()
+
+    def upload(self, name, data, if_generation_match=None):
+        """
+        Upload bytes to name and return the new generation
+
+        if_generation_match=0 only succeeds when the blob does not exist yet.
+        """
+        from google.api_core import exceptions
+
+        blob = self.bucket.blob(name)
+        try:
+            blob.upload_from_string(data, if_generation_match=if_generation_match)
+        except exceptions.PreconditionFailed as e:
+            raise PreconditionFailed(name) from e
+        return blob.generation
+
+    def delete(self, name):
+        """
+        Delete a blob, missing blobs are ignored
+        """
+        from google.api_core import exceptions
+
+        try:
+            self.bucket.blob(name).delete()
+        except exceptions.NotFound:
+            pass
+
+
+class LocalBlobStore():
+    """
+    Filesystem stand-in for GCSBlobStore rooted at a local directory
+
+    The file's modification time in ns stands in for the GCS generation.
+    """
+
+    def __init__(self, root):
+        self.root = root
+
+    def _path(self, name):
+        return os.path.join(self.root, name)
+
+    def _info(self, path):
+        stat = os.stat(path)
+        name = os.path.relpath(path, self.root).replace(os.sep, '/')
+        return BlobInfo(name, stat.st_mtime_ns, stat.st_size)
+
+    def list_blobs(self, prefix=None):
+        paths = glob.glob(os.path.join(self.root, '**', '*'), recursive=True)
+        infos = [self._info(path) for path in paths if os.path.isfile(path)]
+        return sorted(
+            [info for info in infos if info.name.startswith(prefix or '')],
+            key=lambda info: info.name
+        )
+
+    def get_info(self, name):
+        path = self._path(name)
+        if not os.path.isfile(path):
+            return None
+        return self._info(path)
+
+    def download(self, name, generation=None):
+        info = self.get_info(name)
+        if info is None or (generation is not None and info.generation != generation):
+            raise FileNotFoundError(f"{name} (generation {generation})")
+        with open(self._path(name), 'rb') as f:
+            return f.read()
+
+    def upload(self, name, data, if_generation_match=None):
+        if if_generation_match is not None:
+            info = self.get_info(name)
+            generation = 0 if info is None else info.generation
+            if generation != if_generation_match:
+                raise PreconditionFailed(name)
+        path = self._path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        with open(path + '.tmp', 'wb') as f:
+            f.write(data)
+        os.replace(path + '.tmp', path)
+        return self.get_info(name).generation
+
+    def delete(self, name):
+        if os.path.isfile(self._path(name)):
+            os.remove(self._path(name))
+
+
+def get_blob_store(bucket_name):
+    """
+    Return a blob store for bucket_name
+
+    Uses GCS unless FOODIE_BLOB_STORE=local, in which case the bucket is a
+    directory under FOODIE_LOCAL_BLOB_DIR (default 'data/gcs').
+    """
+    store_name = os.environ.get(BLOB_STORE_ENV_VAR, 'gcs')
+    if store_name == 'local':
+        root = os.environ.get(LOCAL_BLOB_DIR_ENV_VAR, os.path.join('data', 'gcs'))
+        return LocalBlobStore(os.path.join(root, bucket_name))
+    elif store_name == 'gcs':
+        return GCSBlobStore(bucket_name)
+    raise ValueError(f"Unknown blob store: {store_name}")
@@ -0,0 +1,101 @@
+from ranking.data_access import get_backend
+from ranking.partition_cache import PartitionCache
+
+
+class TrainingDataReference():
+    """
+    Reference to a ds range of a warehouse training table
+
+    Only the table name and range are stored, so the reference can be kept
+    as a flow artifact in place of the data itself. Rows are streamed one ds
+    partition and one record batch at a time with iter_batches.
+
+    Notes:
+    -with use_cache, partitions are synced into a local PartitionCache
+     first, so a window that slides by a day only downloads that day plus
+     partitions that changed since they were cached
+    -once every batch was read, cached partitions before start_ds are
+     removed, training windows only move forward
+    """
+
+    def __init__(self, table, start_ds, end_ds, project_id=None,
+                 use_cache=True, cache_dir=None):
+        self.table = table
+        self.start_ds = start_ds
+        self.end_ds = end_ds
+        self.project_id = project_id
+        self.use_cache = use_cache
+        self.cache_dir = cache_dir
+
+    @property
+    def full_table_id(self):
+        return f'warehouse_training_tables.{self.table}'
+
+    def get_cache(self):
+        return PartitionCache(
+            self.full_table_id,
+            project_id=self.project_id,
+            cache_dir=self.cache_dir
+        )
+
+    def partitions(self):
+        """
+        List the ds partitions in range, oldest first
+        """
+        if self.use_cache:
+            return sorted(self.get_partition_times())
+        query = f"""
+            select distinct
+                cast(ds as string) as ds
+            from {self.full_table_id}
+            where ds >= '{self.start_ds}'
+                and ds <= '{self.end_ds}'
+            order by ds
+        """
+        backend = get_backend(self.project_id)
+        return backend.query(query)['ds'].tolist()
+
+    def get_partition_times(self):
+        """
+        Return {ds: last modified} of the partitions in range, from metadata
+        """
+        return {
+            ds: last_modified
+            for ds, last_modified in self.get_cache().list_partitions().items()
+            if self.start_ds <= ds <= self.end_ds
+        }
+
+    def sync(self):
+        """
+        Fetch the partitions in range that are missing from the local cache
+        or changed since, returns the fetched ds
+        """
+        return self.get_cache().sync(self.get_partition_times())
+
+    def iter_batches(self, columns=None, batch_size=100000):
+        """
+        Yield the training data as DataFrame batches, partition by partition
+
+        columns limits the read to the columns a model actually reads.
+        """
+        if self.use_cache:
+            cache = self.get_cache()
+            partitions = self.get_partition_times()
+            cache.sync(partitions)
+            for ds in sorted(partitions):
+                for batch in cache.iter_batches(ds, columns=columns, batch_size=batch_size):
+                    yield batch.to_pandas()
+            cache.prune(self.start_ds)
+            return
+
+        backend = get_backend(self.project_id)
+        selected_columns = ', '.join(columns) if columns else '*'
+        for ds in self.partitions():
+            query = f"""
+                select
+                    {selected_columns}
+                from {self.full_table_id}
+                where ds = '{ds}'
+            """
+            for batch in backend.iter_record_batches(query):
+                yield batch.to_pandas()
@@ -7,3 +7,14 @@ def get_model_from_config_spec(model_arch):
     return model
 
 
+def get_model_class(model_arch):
+    """
+    Model class for a model_arch, matched case-insensitively since model
+    store names use the lower-cased arch
+    """
+    model_classes = {
+        'mostlikedmodel': MostLikedModel,
+    }
+    return model_classes[model_arch.lower()]
+
+
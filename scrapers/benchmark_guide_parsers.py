@@ -0,0 +1,84 @@
+import os
+import glob
+import time
+import argparse
+
+from infatuation_parser import PARSER_BACKENDS
+from configs import guide_html_dir
+
+
+def load_pages(html_dir):
+    '''
+        (file name, content) of the guide pages saved in html_dir
+    '''
+    pages = []
+    for html_file in sorted(glob.glob(os.path.join(html_dir, '*.html'))):
+        with open(html_file, 'rb') as f:
+            pages.append((os.path.basename(html_file), f.read()))
+    return pages
+
+
+def make_pages(n_guides, n_venues, seed=0):
+    '''
+        (name, content) of synthetic guide pages, for when no saved pages are at hand
+    '''
+    import numpy as np
+    from benchmarks.synthetic import make_guide_html
+
+    rng = np.random.default_rng(seed)
+    return [
+        (f'guide-{i}.html', make_guide_html(n_venues, rng))
+        for i in range(n_guides)
+    ]
+
+
+def benchmark(pages, repeat=5):
+    '''
+        time every parser backend over (name, content) guide pages, and check
+        that the backends agree on every page
+
+        returns backend -> names of the pages it parsed differently
+    '''
+    mismatches_by_backend = {}
+    reference = {}
+    for backend, parse in PARSER_BACKENDS.items():
+        results = {}
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for url, content in pages:
+                try:
+                    results[url] = parse(url, content)
+                except Exception as e:
+                    results[url] = repr(e)
+            timings.append(time.perf_counter() - start)
+        if not reference:
+            reference = results
+        mismatches = [url for url in results if results[url] != reference[url]]
+        mismatches_by_backend[backend] = mismatches
+        best = min(timings)
+        print(
+            f"{backend}: {best:.3f}s for {len(pages)} pages, "
+            f"{best / max(len(pages), 1) * 1000:.1f} ms per page, "
+            f"{len(mismatches)} pages differ from {next(iter(PARSER_BACKENDS))}"
+        )
+    return mismatches_by_backend
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description='Benchmark guide parser backends')
+    parser.add_argument(
+        '--html-dir', default=guide_html_dir,
+        help='saved guide pages, synthetic pages are generated when not set'
+    )
+    parser.add_argument('--n-guides', type=int, default=20)
+    parser.add_argument('--n-venues', type=int, default=30)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    if args.html_dir is None:
+        pages = make_pages(args.n_guides, args.n_venues)
+    else:
+        pages = load_pages(args.html_dir)
+    benchmark(pages, repeat=args.repeat)
@@ -77,11 +77,146 @@ guide_record_schema = [
 ]
 
 
+google_maps_query_logs_schema = [
+  {
+    "name": "query_url",
+    "type": "STRING",
+    "mode": "NULLABLE"
+  },
+  {
+    "name": "next_page_token",
+    "type": "STRING",
+    "mode": "NULLABLE"
+  },
+  {
+    "name": "status",
+    "type": "STRING",
+    "mode": "NULLABLE"
+  },
+  {
+    "name": "ts",
+    "type": "TIMESTAMP",
+    "mode": "NULLABLE"
+  }
+]
+
+
+google_maps_place_logs_schema = [
+  {
+    "name": "place_id",
+    "type": "STRING",
+    "mode": "NULLABLE"
+  },
+  {
+    "name": "name",
+    "type": "STRING",
+    "mode": "NULLABLE"
+  },
+  {
+    "name": "formatted_address",
+    "type": "STRING",
+    "mode": "NULLABLE"
+  },
+  {
+    "name": "website",
+    "type": "STRING",
+    "mode": "NULLABLE"
+  },
+  {
+    "name": "rating",
+    "type": "FLOAT",
+    "mode": "NULLABLE"
+  },
+  {
+    "name": "user_ratings_total",
+    "type": "FLOAT",
+    "mode": "NULLABLE"
+  },
+  {
+    "name": "price_level",
+    "type": "INTEGER",
+    "mode": "NULLABLE"
+  },
+  {
+    "name": "business_status",
+    "type": "STRING",
+    "mode": "NULLABLE"
+  },
+  {
+    "name": "editorial_summary",
+    "type": "STRING",
+    "mode": "NULLABLE"
+  },
+  {
+    "name": "url",
+    "type": "STRING",
+    "mode": "NULLABLE"
+  },
+  {
+    "name": "geo",
+    "type": "STRING",
+    "mode": "NULLABLE"
+  },
+  {
+    "name": "place_query",
+    "type": "STRING",
+    "mode": "NULLABLE"
+  },
+  {
+    "name": "updated_at",
+    "type": "TIMESTAMP",
+    "mode": "NULLABLE"
+  }
+]
+
 guide_skip_list =[
   'https://www.theinfatuation.com/new-york/guides/best-diners-nyc'    
 ]
 
 
+# guide scraper pipeline settings
+guide_batch_size = 200
+# seconds between requests to the same host, drawn uniformly from (min, max)
+guide_host_delay_seconds = (5, 30)
+guide_fetch_concurrency = 4
+# None uses one parser process per cpu
+guide_parse_workers = None
+# 'lxml' or 'bs4', see infatuation_parser.PARSER_BACKENDS
+guide_parser_backend = 'lxml'
+# directory to keep fetched guide pages in, e.g. 'data/guide_html' to collect
+# fixtures for benchmark_guide_parsers.py, None to skip saving
+guide_html_dir = None
+
+# guide link store, delta shards of new links under the prefix are compacted
+# into a base shard once there are this many
+link_store_prefix = 'infatuation_links/'
+link_store_cache_dir = 'data/link_store'
+link_store_compact_min_deltas = 24
+scraped_guide_index_file = 'data/scraped_guides.npy'
+
+
 manual_guide_list = [
     'https://www.theinfatuation.com'
-]
\ No newline at end of file
+]
+
+# Google Places API client settings
+places_api_max_workers = 8
+places_api_qps = 10
+# nearby search returns at most 3 pages of 20 results
+places_api_max_nearby_pages = 3
+
+# days before a cached place detail field is re-queried
+place_detail_field_ttl_days = {
+    'place_id': 365,
+    'name': 30,
+    'formatted_address': 30,
+    'geometry': 90,
+    'url': 30,
+    'website': 30,
+    'editorial_summary': 30,
+    'price_level': 30,
+    'business_status': 7,
+    'rating': 7,
+    'user_ratings_total': 7,
+}
+place_cache_max_places = 200000
@@ -1,18 +1,30 @@
 import environ
 import io
 import os
-import requests
-import json
+import itertools
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 
 import pandas as pd
 
 from google.cloud import secretmanager
-from google.cloud import bigquery
-
-from shapely.geometry import Polygon, Point
-from shapely.wkt import loads
-import random
+from google.api_core.exceptions import NotFound
+
+import numpy as np
+
+from ranking.data_access import get_backend, get_bigquery_client, cast_to_schema
+from configs import (
+    places_api_max_workers,
+    places_api_qps,
+    places_api_max_nearby_pages,
+    place_detail_field_ttl_days,
+    place_cache_max_places,
+    google_maps_query_logs_schema,
+    google_maps_place_logs_schema,
+)
+from places_api import PlacesClient
+from place_cache import PlaceDetailsCache
+from neighborhood_geometry import load_neighborhoods, sample_points_in_polygon
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -38,36 +50,28 @@ else:
 
 API_KEY = os.environ['GOOGLE_MAPS_API_KEY']
 PROJECT_ID = os.environ['PROJECT_ID']
+PLACE_CACHE_FILE = 'data/place_details_cache.sqlite'
+NEIGHBORHOOD_CACHE_FILE = 'data/neighborhoods.pickle'
 
-# create a client instance for your project
-client = bigquery.Client(project=PROJECT_ID, location="US")
+# shared client and data backend for your project
+client = get_bigquery_client(PROJECT_ID, location="US")
+backend = get_backend(PROJECT_ID, location="US")
 
 
-def get_query_content(query):
-    r = requests.get(query)
-    content = json.loads(r.content)
-    return content
+# pooled, rate limited Places API client
+places_client = PlacesClient(
+    API_KEY,
+    max_workers=places_api_max_workers,
+    qps=places_api_qps
+)
 
 
 def get_nearby_places(lat, long, radius=50):
-    keyword = 'restaurant'
-    location = f'{lat},{long}'
-    query = f'https://maps.googleapis.com/maps/api/place/nearbysearch/json?location={location}&radius={radius}&keyword={keyword}&key={API_KEY}'
-    content = get_query_content(query)
-    return content, query
+    return places_client.get_nearby_places(lat, long, radius=radius)
 
 
 def get_place_details(place_id):
-    field_list = [
-        'formatted_address', 'name', 'place_id', 'business_status',
-        'url', 'website', 'editorial_summary', 'price_level', 'rating',
-        'user_ratings_total', 'geometry'
-    ]
-
-    fields = ','.join(field_list)
-    query = f'https://maps.googleapis.com/maps/api/place/details/json?fields={fields}&place_id={place_id}&key={API_KEY}'
-    content = get_query_content(query)
-    return content, query
+    return places_client.get_place_details(place_id)
 
 
 def get_field(field, content):
@@ -92,56 +96,36 @@ def get_geostring(geometry_data):
     return geo_string
 
 
-def upload_csv_to_bq(filename, dataset_id, table_id):
+def get_table_schema(table_id, default_schema):
     '''
-        uploads CSV to bigquery, precondition, table already exists
+        schema of the existing table, so loads keep its types, default_schema
+        when the table does not exist yet
     '''
-    # tell the client everything it needs to know to upload our csv
-    dataset_ref = client.dataset(dataset_id)
-    table_ref = dataset_ref.table(table_id)
-    job_config = bigquery.LoadJobConfig()
-    job_config.source_format = bigquery.SourceFormat.CSV
-    job_config.autodetect = True
-    job_config.write_disposition = 'WRITE_APPEND'
-    # load the csv into bigquery
-    with open(filename, "rb") as source_file:
-        job = client.load_table_from_file(source_file, table_ref, job_config=job_config)
-
-    job.result()  # Waits for table load to complete.
-    # looks like everything worked :)
-    print("Loaded {} rows into {}:{}.".format(job.output_rows, dataset_id, table_id))
-
-
-def generate_random_point_inside_polygon(polygon):
-    min_x, min_y, max_x, max_y = polygon.bounds
-
-    while True:
-        # Generate random coordinates within the bounding box of the polygon
-        x = random.uniform(min_x, max_x)
-        y = random.uniform(min_y, max_y)
+    try:
+        return client.get_table(table_id).schema
+    except NotFound:
+        return default_schema
 
-        # Create a Point object
-        point = Point(x, y)
 
-        # Check if the point is inside the polygon
-        if polygon.contains(point):
-            return y, x
+def load_dataframe_to_bq(df, table_id, default_schema, local_file):
+    '''
+        cast df to the table schema and append it with a Parquet load job,
+        a local Parquet copy is kept in local_file
+    '''
+    schema = get_table_schema(table_id, default_schema)
+    df = cast_to_schema(df, schema)
+    df.to_parquet(local_file, index=False)
+    backend.write_dataframe(df, table_id, schema=schema)
+    print(f"Loaded {len(df)} rows into {table_id}.")
 
 
-def get_query_points(n_priority=1, n_secondary=5):
+def get_query_points(n_priority=1, n_secondary=5, n_points_per_neighborhood=1):
     '''
         Use neighborhood polygons
         Sample neighborhoods according to some weight (ex: 4 slots reserved for priority neighborhoods, 2 queries per day for random neighborhoods)
-        Sample a random lat/long point from inside each polygon
+        Sample random lat/long points from inside each polygon
     '''
-    query = """
-        SELECT name, borough, any_value(geo) as geo FROM restaurant_data.neighborhoods
-        group by 1, 2
-    """
-
-    df = client.query(
-        query=query
-    ).to_dataframe()
+    df = load_neighborhoods(client, backend, NEIGHBORHOOD_CACHE_FILE)
 
     priority_neighborhoods = [
         'Williamsburg', 'Park Slope', 'Upper East Side', 'Chelsea', 'East Village',  'West Village', 'Bushwick'
@@ -152,7 +136,11 @@ def get_query_points(n_priority=1, n_secondary=5):
     sampled_neighborhoods = df[priority_mask]['name'].sample(n_priority).to_list() \
         + df[secondary_mask]['name'].sample(n_secondary).to_list()
     sampled_mask = df['name'].isin(sampled_neighborhoods)
-    query_points = df[sampled_mask].apply(lambda x: generate_random_point_inside_polygon(loads(x['geo'])), 1).to_list()
+    rng = np.random.default_rng()
+    query_points = []
+    for polygon in df[sampled_mask]['geometry']:
+        lats, longs = sample_points_in_polygon(polygon, n_points_per_neighborhood, rng)
+        query_points.extend(zip(lats.tolist(), longs.tolist()))
     return query_points
 
 if __name__ == "__main__":
@@ -163,16 +151,20 @@ if __name__ == "__main__":
     
     query_records = []
     place_records = []
-    # iterate through query points
-    for lat, long in query_points:
+    place_queries = []
+    # get all result pages for each query point concurrently
+    query_point_pages = places_client.get_nearby_places_pages_many(
+        query_points,
+        max_pages=places_api_max_nearby_pages
+    )
+    # iterate through result pages
+    for place_list, place_query in itertools.chain.from_iterable(query_point_pages):
 
-        # get list of restaurants from each query
-        place_list, place_query = get_nearby_places(lat, long)
         # store query metadata
         next_page_token = get_field('next_page_token', place_list)
         status = get_field('status', place_list)
         print(status)
-        place_list = place_list['results']
+        place_list = place_list.get('results', [])
         print(len(place_list))
         place_query = place_query[:-44]  # removes API key
         # write api call to query record
@@ -184,44 +176,79 @@ if __name__ == "__main__":
             'ts': query_ts,
         })
 
-        # iterate through resturants
+        # queue resturants for detail lookup
         for place in place_list:
-            # pull restaurant details
-            place_id = place['place_id']
-            details, detail_query = get_place_details(place_id)
-            details = details['result']
-            # write place details to places record
-            detail_updated_ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            place_records.append({
-                'place_id': get_field('place_id', details),
-                'name': get_field('name', details),
-                'formatted_address': get_field('formatted_address', details),
-                'website': get_field('website', details),
-                'rating': get_field('rating', details),
-                'user_ratings_total': get_field('user_ratings_total', details),
-                'price_level': get_field('price_level', details),
-                'business_status': get_field('business_status', details),
-                'editorial_summary': get_field('editorial_summary', details),
-                'url': get_field('url', details),
-                'geo': get_geostring(get_field('geometry', details)),
-                'place_query': place_query,
-                'updated_at': detail_updated_ts
-            })
-
-    # save query results to csv
-    query_df = pd.DataFrame(query_records)
-    query_df.to_csv('data/google_places_queries.csv', index=False)
-    # save places detail to csv
-    place_df = pd.DataFrame(place_records)
-    place_df.to_csv('data/google_places.csv', index=False)      
-
-    # upload dataframe to raw logs table
-    upload_csv_to_bq(
-        filename='data/google_places_queries.csv',
-        dataset_id='restaurant_data',
-        table_id='google_maps_query_logs'
+            place_queries.append((place['place_id'], place_query))
+
+    # only re-query places that are unseen or have stale cached fields
+    place_cache = PlaceDetailsCache(
+        PLACE_CACHE_FILE,
+        place_detail_field_ttl_days,
+        max_places=place_cache_max_places
     )
-    upload_csv_to_bq(
-        filename='data/google_places.csv',
-        dataset_id='restaurant_data', table_id='google_maps_place_logs'
+    stale_place_queries = []
+    for place_id, place_query in dict(place_queries).items():
+        cached, stale_fields = place_cache.lookup(place_id)
+        if stale_fields:
+            stale_place_queries.append((place_id, place_query, cached, stale_fields))
+    place_cache.log_stats()
+
+    # pull stale restaurant details concurrently, results in queue order
+    place_details = places_client.get_place_details_many(
+        [place_id for place_id, _, _, _ in stale_place_queries],
+        [stale_fields for _, _, _, stale_fields in stale_place_queries]
     )
+    # cache updates are applied only once the logs are loaded, so places
+    # from a failed load are fetched and logged again on the next run
+    cache_updates = []
+    for (place_id, place_query, cached, stale_fields), (details, detail_query) \
+            in zip(stale_place_queries, place_details):
+        if details.get('status') != 'OK':
+            print(f"{place_id}: {details.get('status')}")
+            continue
+        cache_updates.append((place_id, details['result'], stale_fields))
+        # fields cached as missing are left out, as the API would
+        cached = {f: v for f, v in cached.items() if v is not None}
+        details = {**cached, **details['result']}
+        # write place details to places record
+        detail_updated_ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        place_records.append({
+            'place_id': get_field('place_id', details),
+            'name': get_field('name', details),
+            'formatted_address': get_field('formatted_address', details),
+            'website': get_field('website', details),
+            'rating': get_field('rating', details),
+            'user_ratings_total': get_field('user_ratings_total', details),
+            'price_level': get_field('price_level', details),
+            'business_status': get_field('business_status', details),
+            'editorial_summary': get_field('editorial_summary', details),
+            'url': get_field('url', details),
+            'geo': get_geostring(get_field('geometry', details)),
+            'place_query': place_query,
+            'updated_at': detail_updated_ts
+        })
+
+    # load query and place logs concurrently, typed to the table schemas
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        loads = [
+            executor.submit(
+                load_dataframe_to_bq,
+                pd.DataFrame(query_records),
+                'restaurant_data.google_maps_query_logs',
+                google_maps_query_logs_schema,
+                'data/google_places_queries.parquet'
+            ),
+            executor.submit(
+                load_dataframe_to_bq,
+                pd.DataFrame(place_records),
+                'restaurant_data.google_maps_place_logs',
+                google_maps_place_logs_schema,
+                'data/google_places.parquet'
+            ),
+        ]
+        for load in loads:
+            load.result()
+
+    for place_id, result, stale_fields in cache_updates:
+        place_cache.update(place_id, result, stale_fields)
+    place_cache.close()
@@ -0,0 +1,127 @@
+import os
+import time
+import random
+import asyncio
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from infatuation_parser import parse_guide
+
+
+class PoliteFetcher():
+    '''
+        Async page fetcher with a per-host politeness delay
+
+        Requests to the same host are serialized and spaced a random
+        host_delay_seconds (min, max) apart, requests to different hosts run
+        concurrently up to max_concurrency. The blocking requests calls run on
+        a thread pool over one pooled session.
+    '''
+
+    def __init__(self, user_agents, host_delay_seconds=(5, 30), max_concurrency=4, timeout=30):
+        self.user_agents = user_agents
+        self.host_delay_seconds = host_delay_seconds
+        self.timeout = timeout
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrency)
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.host_locks = {}
+        self.host_next_request = {}
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_maxsize=max_concurrency)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def _get(self, url):
+        headers = {
+            'User-Agent': random.choice(self.user_agents)
+        }
+        page = self.session.get(url, headers=headers, timeout=self.timeout)
+        page.raise_for_status()
+        return page.content
+
+    async def fetch(self, url):
+        host = urlparse(url).netloc
+        lock = self.host_locks.setdefault(host, asyncio.Lock())
+        async with lock:
+            wait = self.host_next_request.get(host, 0) - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            async with self.semaphore:
+                loop = asyncio.get_running_loop()
+                try:
+                    return await loop.run_in_executor(self.executor, self._get, url)
+                finally:
+                    self.host_next_request[host] = time.monotonic() \
+                        + random.uniform(*self.host_delay_seconds)
+
+    def close(self):
+        self.executor.shutdown()
+        self.session.close()
+
+
+def get_html_file_name(url):
+    return urlparse(url).path.strip('/').replace('/', '__') + '.html'
+
+
+async def _scrape_guides(urls, fetcher, parse_pool, parser_backend, save_html_dir):
+    loop = asyncio.get_running_loop()
+
+    async def scrape(url):
+        # the next fetch starts while this page is parsed in another process
+        content = await fetcher.fetch(url)
+        print(f"Fetched {url}")
+        if save_html_dir is not None:
+            with open(os.path.join(save_html_dir, get_html_file_name(url)), 'wb') as f:
+                f.write(content)
+        return await loop.run_in_executor(
+            parse_pool, parse_guide, url, content, parser_backend
+        )
+
+    return await asyncio.gather(
+        *[scrape(url) for url in urls], return_exceptions=True
+    )
+
+
+def scrape_guides(urls, user_agents, host_delay_seconds=(5, 30),
+                  max_concurrency=4, max_parse_workers=None,
+                  parser_backend='lxml', save_html_dir=None):
+    '''
+        Fetch and parse guides with fetching and parsing overlapped
+
+        fetched pages are kept in save_html_dir when given, e.g. as fixtures
+        for benchmark_guide_parsers.py
+
+        returns (guide_record_list, restaurant_record_dict, skipped_urls),
+        guides that fail to download or parse are skipped
+    '''
+    guide_record_list = []
+    restaurant_record_dict = {}
+    skipped_urls = []
+
+    if save_html_dir is not None:
+        os.makedirs(save_html_dir, exist_ok=True)
+    with ProcessPoolExecutor(max_workers=max_parse_workers) as parse_pool:
+        fetcher = PoliteFetcher(
+            user_agents,
+            host_delay_seconds=host_delay_seconds,
+            max_concurrency=max_concurrency
+        )
+        try:
+            results = asyncio.run(_scrape_guides(
+                urls, fetcher, parse_pool, parser_backend, save_html_dir
+            ))
+        finally:
+            fetcher.close()
+
+    for url, result in zip(urls, results):
+        if isinstance(result, Exception):
+            print(f"Skipping {url}: {result!r}")
+            skipped_urls.append(url)
+            continue
+        guide_record, restaurant_records = result
+        restaurant_record_dict.update(restaurant_records)
+        guide_record_list.append(guide_record)
+    return guide_record_list, restaurant_record_dict, skipped_urls
@@ -1,23 +1,30 @@
 import environ
 import io
 import os
-import json
 import random
-import requests
-import time
-import re
-from datetime import datetime
-from bs4 import BeautifulSoup
 
 
 from google.cloud import secretmanager
-from google.cloud import bigquery
-from google.cloud import storage
+from google.api_core.exceptions import NotFound
+from ranking.data_access import get_backend, get_bigquery_client
+from ranking.storage import get_blob_store
+from ranking.bulk_writer import BulkWriter
 from configs import (
     restaurant_records_schema, 
     guide_record_schema, 
-    guide_skip_list
+    guide_skip_list,
+    guide_batch_size,
+    guide_host_delay_seconds,
+    guide_fetch_concurrency,
+    guide_parse_workers,
+    guide_parser_backend,
+    guide_html_dir,
+    link_store_prefix,
+    link_store_cache_dir,
+    scraped_guide_index_file
 )
+from guide_pipeline import scrape_guides
+from link_store import LinkStore, ScrapedLinkIndex
 
 # List of user-agent strings
 user_agents = [
@@ -56,190 +63,74 @@ else:
 API_KEY = os.environ['GOOGLE_MAPS_API_KEY']
 PROJECT_ID = os.environ['PROJECT_ID']
 
-bq_client = bigquery.Client(project=PROJECT_ID, location="US")
+bq_client = get_bigquery_client(PROJECT_ID, location="US")
+backend = get_backend(PROJECT_ID, location="US")
+bulk_writer = BulkWriter(client=bq_client)
 
 def upload_to_bigquery(dataset_id, table_id, data, schema):
-    # create a client instance for your project
-    bq_client = bigquery.Client(project=PROJECT_ID, location="US")
-
-    # If the table does not exist, create it
-    full_table_id = f'foodie-355420.restaurant_data.{table_id}'
-    try:
-        # Try to get the table, if it exists
-        table = bq_client.get_table(full_table_id)
-    except:
-        
-        table = bigquery.Table(full_table_id, schema=schema)
-        table = bq_client.create_table(table)
-        print(f"Created table {table_id} in dataset {dataset_id}")
-    
-
-
-    table_ref = bq_client.dataset(dataset_id).table(table_id)
-    table = bq_client.get_table(table_ref)
-    errors = bq_client.insert_rows_json(table, data)
+    # the table is created if it does not exist
+    full_table_id = f'foodie-355420.{dataset_id}.{table_id}'
+    errors = bulk_writer.insert_rows(full_table_id, data, schema=schema)
     if errors:
         print(f"Encountered errors while inserting rows: {errors}")
     else:
         print("Data uploaded successfully.")
-
-
-def download_from_gcs(bucket_name, source_blob_name, destination_file_name):
-    """Downloads a file from the bucket."""
-    storage_client = storage.Client()
-    bucket = storage_client.bucket(bucket_name)
-    blob = bucket.blob(source_blob_name)
-    blob.download_to_filename(destination_file_name)
-    print(f"Blob {source_blob_name} downloaded to {destination_file_name}.")
+    return errors
 
 
 INFATUATION_GCS_BUCKET = 'foodie-infatuation-data'
 INFATUATION_GCS_BLOB = 'infatuation_link_list.json'
-INFATUATION_LOCAL_FILE = 'data/infatuation_link_list.json'
 
 if __name__ == "__main__":
 
-    # get existing guides
-    try:
+    # local index of scraped guides, built from the guides table on first run
+    scraped_index = ScrapedLinkIndex(scraped_guide_index_file)
+    if not scraped_index.exists:
         query = """
             SELECT distinct guide_url from restaurant_data.infatuation_guides_v2
         """
-
-        scraped_guides = bq_client.query(
-            query=query
-        ).to_dataframe()['guide_url'].tolist()
-    except:
-        scraped_guides = []
-    print(len(scraped_guides))
-    
-    # get link list for new guides
-    download_from_gcs(
-        bucket_name=INFATUATION_GCS_BUCKET, 
-        source_blob_name=INFATUATION_GCS_BLOB, 
-        destination_file_name=INFATUATION_LOCAL_FILE
+        # any other failure stops the run, an index saved without the
+        # scraped guides would have them scraped and inserted again for good
+        try:
+            scraped_guides = backend.query(query)['guide_url'].tolist()
+        except NotFound:
+            # no guides table yet, nothing was scraped before
+            scraped_guides = []
+        scraped_index.add(scraped_guides)
+    print(len(scraped_index.hashes) if scraped_index.exists else 0)
+
+    # get link list for new guides, only new link shards are downloaded
+    link_store = LinkStore(
+        get_blob_store(INFATUATION_GCS_BUCKET),
+        link_store_prefix,
+        link_store_cache_dir,
+        legacy_blob=INFATUATION_GCS_BLOB
     )
-    with open(INFATUATION_LOCAL_FILE, 'r') as json_file:
-        new_guides = json.load(json_file)
-        print(len(new_guides))
-    
+    new_guides = link_store.read_links()
+    print(len(new_guides))
+
     # take set difference for new links and randomly sample subset for scraping
-    candidate_guides = list(set(new_guides).difference(set(scraped_guides)))
-    sample_size = min(len(candidate_guides), 3)
+    candidate_guides = [
+        url for url, scraped in zip(new_guides, scraped_index.contains(new_guides))
+        if not scraped
+    ]
+    sample_size = min(len(candidate_guides), guide_batch_size)
     candidate_guides = random.sample(candidate_guides, sample_size)
     print(len(candidate_guides))
     candidate_guides = [x for x in candidate_guides if x not in guide_skip_list]
     print(len(candidate_guides))
     # iterate through links
-    # extract guide + restaurant data 
-
-    guide_record_list = []
-    restaurant_record_dict = {}
-    skipped_urls = []
-
-    # regex to collect scraped guides
-    guide_title_class_pattern = re.compile(r'.*styles_title.*')
-    date_div_pattern = re.compile(r'styles_contributorsList.*')
-    guide_body_class_pattern = re.compile(r'.*styles_postContent.*flatplan_body.*')
-    restaurant_title_pattern = re.compile(r'.*flatplan_venue-heading.*')
-    restaurant_div_pattern = re.compile(r'.*styles_venueContainer.*')
-    restaurant_desc_pattern = re.compile(r'.*chakra-text.*')
-    perfect_for_class_pattern = re.compile(r'.*flatplan_perfectFor.*')
-    perfect_for_span_class_pattern = re.compile(r'.*perfectForTag.*')
-    cuisine_tag_pattern = re.compile(r'.*cuisineTag.*')
-    neighborhood_tag_pattern = re.compile('.*neighborhoodTag.*')
-
-    for i, url in enumerate(candidate_guides):
-        print(url)
-        # sleep for random amount of time
-        time_to_sleep = random.uniform(1, 3600)
-        print(f"Sleeping for {time_to_sleep:.2f} seconds")
-        # TODO: Uncomment 
-        time.sleep(time_to_sleep)
-        
-        headers = {
-            'User-Agent': get_random_user_agent(user_agents)
-        }
-
-        # download guide via request API
-        page = requests.get(url, headers=headers)
-        soup = BeautifulSoup(page.content, "html.parser")
-        # import pdb;pdb.set_trace()
-        
-        # Extract guide data
-        guide_body_div = soup.find('div', class_=guide_body_class_pattern)
-        guide_record = {
-            'title':soup.find('span', class_=guide_title_class_pattern).getText(),
-            'publish_date': soup.find('div', class_=date_div_pattern).find('p').getText(),
-            'description_list':[guide_body_div.find('p').getText()],
-            'guide_url':url,
-        }
-        
-        # Extract restaurant data        
-        restaurant_names = [c.text for c in guide_body_div.find_all('h2', class_=restaurant_title_pattern)]
-        restaurant_divs = dict(zip(
-            restaurant_names,
-            guide_body_div.find_all('div', class_=restaurant_div_pattern)
-        ))
-        restaurant_descriptions = dict(zip(
-            restaurant_names,
-            [p.getText() for p in guide_body_div.find_all('p', class_=restaurant_desc_pattern, recursive=False)[1:]]
-        ))
-
-        assert len(restaurant_names) == len(restaurant_divs)
-        # TODO: find ratings logic
-    #     rating_divs = guide_body_div.find_all('div', 'styles_badge__cDu6b styles_standalone__TQgI0 styles_rating__0wWpz')
-    #     restaurant_rating_dict = dict(zip(
-    #     [re.match(r'(.*) ([a-z]*) image$', x.parent.find('img', 'styles_image__520x0').attrs['alt']).group(1) for x in rating_divs],
-    #     [x.text for x in rating_divs]
-    #     ))
-
-        # Extract the JSON string from the script tag
-        scripts = soup.find_all('script', type='application/ld+json')
-        json_str = scripts[1].string
-        # Parse the JSON string
-        data = json.loads(json_str)
-        adress_dict_keys = [x['name'].replace("&apos;", "'") for x in data['itemListElement']]
-        adress_dict_values = [x['item']['address']['name'] for x in data['itemListElement']]
-        adress_dict = dict(zip(adress_dict_keys, adress_dict_values))
-        print(len(adress_dict ))
-
-        # initialize restaurant data structure
-        num_restaurants = len(restaurant_names)
-        restaurant_records = {}
-        for rn in restaurant_names:
-            restaurant_records[rn]={}
-
-        # populate restaurant data structure
-        
-        for r in restaurant_records:
-            r_div = restaurant_divs.get(r)
-            tag_set = r_div.find_all('p', {'data-testid': 'tags-groupTag'})
-            r_perfect_for_div = r_div.find('div', class_=perfect_for_class_pattern)
-            r_cusine_tags = r_div.find_all('span', class_=cuisine_tag_pattern)
-            r_neighborhood_tags = r_div.find_all('span', class_=neighborhood_tag_pattern)
-            r_price_list = [
-                span.get('data-price') for span in r_div.find_all('span') 
-                if 'data-price' in span.attrs
-            ]
-            r_price = None
-            if len(r_price_list) > 0:
-                r_price = r_price_list[0]
-            restaurant_records.get(r)['description_list'] = [restaurant_descriptions.get(r)]
-            restaurant_records.get(r)['review_link'] = None
-            restaurant_records.get(r)['cusine'] = [c.getText() for c in r_cusine_tags]
-            # import pdb;pdb.set_trace()
-            if r_perfect_for_div is not None:
-                restaurant_records.get(r)['perfect_for'] = [span.getText() for span in r_perfect_for_div.find_all('span', class_=perfect_for_span_class_pattern)]
-            restaurant_records.get(r)['price'] = r_price
-            
-            restaurant_records.get(r)['neighborhood'] = [n.getText() for n in r_neighborhood_tags]
-            restaurant_records.get(r)['address'] = adress_dict.get(r)
-            # restaurant_records.get(r)['rating'] = restaurant_rating_dict.get(r) #TODO
-            restaurant_records.get(r)['rating'] = None
-            restaurant_records.get(r)['guide_link'] = url
-        
-        restaurant_record_dict.update(restaurant_records)
-        guide_record_list.append(guide_record)
+    # extract guide + restaurant data
+    guide_record_list, restaurant_record_dict, skipped_urls = scrape_guides(
+        candidate_guides,
+        user_agents,
+        host_delay_seconds=guide_host_delay_seconds,
+        max_concurrency=guide_fetch_concurrency,
+        max_parse_workers=guide_parse_workers,
+        parser_backend=guide_parser_backend,
+        save_html_dir=guide_html_dir
+    )
+    print(f"Scraped {len(guide_record_list)} guides, skipped {len(skipped_urls)}")
 
 
 
@@ -256,12 +147,18 @@ if __name__ == "__main__":
         restaurant_records_schema
     )
     # Upload guide_record_list to BigQuery
-    upload_to_bigquery(
+    errors = upload_to_bigquery(
         "restaurant_data", 
         "infatuation_guides_v2", 
         guide_record_list, 
         guide_record_schema
     )
+    # only guides whose row landed count as scraped, failed ones are retried
+    failed_indices = {error['index'] for error in errors}
+    scraped_index.add([
+        g['guide_url'] for i, g in enumerate(guide_record_list)
+        if i not in failed_indices
+    ])
 
   
         # restaurant_counter = -1
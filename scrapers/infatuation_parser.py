@@ -0,0 +1,203 @@
+import re
+import json
+
+from bs4 import BeautifulSoup
+from lxml import etree, html
+
+# regex to collect scraped guides
+guide_title_class_pattern = re.compile(r'.*styles_title.*')
+date_div_pattern = re.compile(r'styles_contributorsList.*')
+guide_body_class_pattern = re.compile(r'.*styles_postContent.*flatplan_body.*')
+restaurant_title_pattern = re.compile(r'.*flatplan_venue-heading.*')
+restaurant_div_pattern = re.compile(r'.*styles_venueContainer.*')
+restaurant_desc_pattern = re.compile(r'.*chakra-text.*')
+perfect_for_class_pattern = re.compile(r'.*flatplan_perfectFor.*')
+perfect_for_span_class_pattern = re.compile(r'.*perfectForTag.*')
+cuisine_tag_pattern = re.compile(r'.*cuisineTag.*')
+neighborhood_tag_pattern = re.compile('.*neighborhoodTag.*')
+
+
+def get_address_dict(json_str):
+    '''
+        restaurant name -> address from the guide's ld+json item list
+    '''
+    data = json.loads(json_str)
+    adress_dict_keys = [x['name'].replace("&apos;", "'") for x in data['itemListElement']]
+    adress_dict_values = [x['item']['address']['name'] for x in data['itemListElement']]
+    return dict(zip(adress_dict_keys, adress_dict_values))
+
+
+def parse_guide_bs4(url, content):
+    '''
+        BeautifulSoup html.parser backend, every class pattern lookup
+        re-scans the tree
+    '''
+    soup = BeautifulSoup(content, "html.parser")
+
+    # Extract guide data
+    guide_body_div = soup.find('div', class_=guide_body_class_pattern)
+    guide_record = {
+        'title':soup.find('span', class_=guide_title_class_pattern).getText(),
+        'publish_date': soup.find('div', class_=date_div_pattern).find('p').getText(),
+        'description_list':[guide_body_div.find('p').getText()],
+        'guide_url':url,
+    }
+
+    # Extract restaurant data
+    restaurant_names = [c.text for c in guide_body_div.find_all('h2', class_=restaurant_title_pattern)]
+    restaurant_divs = dict(zip(
+        restaurant_names,
+        guide_body_div.find_all('div', class_=restaurant_div_pattern)
+    ))
+    restaurant_descriptions = dict(zip(
+        restaurant_names,
+        [p.getText() for p in guide_body_div.find_all('p', class_=restaurant_desc_pattern, recursive=False)[1:]]
+    ))
+
+    assert len(restaurant_names) == len(restaurant_divs)
+
+    # Extract the JSON string from the script tag
+    scripts = soup.find_all('script', type='application/ld+json')
+    adress_dict = get_address_dict(scripts[1].string)
+
+    # initialize restaurant data structure
+    restaurant_records = {}
+    for rn in restaurant_names:
+        restaurant_records[rn]={}
+
+    # populate restaurant data structure
+    for r in restaurant_records:
+        r_div = restaurant_divs.get(r)
+        r_perfect_for_div = r_div.find('div', class_=perfect_for_class_pattern)
+        r_cusine_tags = r_div.find_all('span', class_=cuisine_tag_pattern)
+        r_neighborhood_tags = r_div.find_all('span', class_=neighborhood_tag_pattern)
+        r_price_list = [
+            span.get('data-price') for span in r_div.find_all('span')
+            if 'data-price' in span.attrs
+        ]
+        r_price = None
+        if len(r_price_list) > 0:
+            r_price = r_price_list[0]
+        restaurant_records.get(r)['description_list'] = [restaurant_descriptions.get(r)]
+        restaurant_records.get(r)['review_link'] = None
+        restaurant_records.get(r)['cusine'] = [c.getText() for c in r_cusine_tags]
+        if r_perfect_for_div is not None:
+            restaurant_records.get(r)['perfect_for'] = [span.getText() for span in r_perfect_for_div.find_all('span', class_=perfect_for_span_class_pattern)]
+        restaurant_records.get(r)['price'] = r_price
+
+        restaurant_records.get(r)['neighborhood'] = [n.getText() for n in r_neighborhood_tags]
+        restaurant_records.get(r)['address'] = adress_dict.get(r)
+        # TODO: find ratings logic
+        restaurant_records.get(r)['rating'] = None
+        restaurant_records.get(r)['guide_link'] = url
+
+    return guide_record, restaurant_records
+
+
+def has_class(class_name):
+    return f"contains(@class, '{class_name}')"
+
+
+# compiled once per process, same matches as the bs4 class patterns
+guide_title_xpath = etree.XPath(f"//span[{has_class('styles_title')}]")
+date_div_xpath = etree.XPath(f"//div[{has_class('styles_contributorsList')}]//p")
+guide_body_xpath = etree.XPath(
+    f"//div[{has_class('styles_postContent')} and {has_class('flatplan_body')}]"
+)
+ld_json_xpath = etree.XPath("//script[@type='application/ld+json']")
+perfect_for_span_xpath = etree.XPath(f".//span[{has_class('perfectForTag')}]")
+
+
+def parse_venue(r_div, description, address, url):
+    # one walk over the venue subtree collects every tag
+    cuisine, neighborhood, price_list = [], [], []
+    perfect_for_div = None
+    for el in r_div.iterdescendants('span', 'div'):
+        class_name = el.get('class', '')
+        if el.tag == 'span':
+            if 'cuisineTag' in class_name:
+                cuisine.append(el.text_content())
+            if 'neighborhoodTag' in class_name:
+                neighborhood.append(el.text_content())
+            if 'data-price' in el.attrib:
+                price_list.append(el.get('data-price'))
+        elif el.tag == 'div' and perfect_for_div is None \
+                and 'flatplan_perfectFor' in class_name:
+            perfect_for_div = el
+    record = {
+        'description_list': [description],
+        'review_link': None,
+        'cusine': cuisine,
+    }
+    if perfect_for_div is not None:
+        record['perfect_for'] = [
+            span.text_content() for span in perfect_for_span_xpath(perfect_for_div)
+        ]
+    record['price'] = price_list[0] if price_list else None
+    record['neighborhood'] = neighborhood
+    record['address'] = address
+    # TODO: find ratings logic
+    record['rating'] = None
+    record['guide_link'] = url
+    return record
+
+
+def parse_guide_lxml(url, content):
+    '''
+        lxml backend, compiled XPath for the guide fields and a single walk
+        over the guide body for the restaurants
+    '''
+    tree = html.fromstring(content)
+    guide_body_div = guide_body_xpath(tree)[0]
+
+    restaurant_names, restaurant_div_list, description_list = [], [], []
+    first_p = None
+    for el in guide_body_div.iterdescendants('h2', 'div', 'p'):
+        class_name = el.get('class', '')
+        if el.tag == 'p' and first_p is None:
+            first_p = el
+        if el.tag == 'h2' and 'flatplan_venue-heading' in class_name:
+            restaurant_names.append(el.text_content())
+        elif el.tag == 'div' and 'styles_venueContainer' in class_name:
+            restaurant_div_list.append(el)
+        elif el.tag == 'p' and 'chakra-text' in class_name \
+                and el.getparent() is guide_body_div:
+            description_list.append(el.text_content())
+
+    guide_record = {
+        'title': guide_title_xpath(tree)[0].text_content(),
+        'publish_date': date_div_xpath(tree)[0].text_content(),
+        'description_list': [first_p.text_content()],
+        'guide_url': url,
+    }
+
+    restaurant_divs = dict(zip(restaurant_names, restaurant_div_list))
+    restaurant_descriptions = dict(zip(restaurant_names, description_list[1:]))
+    assert len(restaurant_names) == len(restaurant_divs)
+    adress_dict = get_address_dict(ld_json_xpath(tree)[1].text)
+
+    restaurant_records = {}
+    for r in restaurant_names:
+        restaurant_records[r] = parse_venue(
+            restaurant_divs.get(r),
+            restaurant_descriptions.get(r),
+            adress_dict.get(r),
+            url
+        )
+    return guide_record, restaurant_records
+
+
+PARSER_BACKENDS = {
+    'bs4': parse_guide_bs4,
+    'lxml': parse_guide_lxml,
+}
+
+
+def parse_guide(url, content, backend='lxml'):
+    '''
+        Extract the guide record and restaurant records from a guide page
+
+        returns (guide_record, {restaurant_name: restaurant_record}), module
+        level so it can run in a worker process
+    '''
+    return PARSER_BACKENDS[backend](url, content)
@@ -1,10 +1,19 @@
-from google.cloud import storage
+import os
 import json
+import hashlib
 import requests
 import random
 import time
 from bs4 import BeautifulSoup
 
+from ranking.storage import get_blob_store
+from link_store import LinkStore
+from configs import (
+    link_store_prefix,
+    link_store_cache_dir,
+    link_store_compact_min_deltas
+)
+
 # List of user-agent strings
 user_agents = [
     'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
@@ -17,25 +26,70 @@ user_agents = [
 def get_random_user_agent(user_agents):
     return random.choice(user_agents)
 
-def upload_to_gcs(bucket_name, source_file_name, destination_blob_name):
-    """Uploads a file to the bucket."""
-    storage_client = storage.Client()
-    bucket = storage_client.bucket(bucket_name)
-    blob = bucket.blob(destination_blob_name)
-    blob.upload_from_filename(source_file_name)
-    print(f"File {source_file_name} uploaded to {destination_blob_name}.")
-
-def download_from_gcs(bucket_name, source_blob_name, destination_file_name):
-    """Downloads a file from the bucket."""
-    storage_client = storage.Client()
-    bucket = storage_client.bucket(bucket_name)
-    blob = bucket.blob(source_blob_name)
-    blob.download_to_filename(destination_file_name)
-    print(f"Blob {source_blob_name} downloaded to {destination_file_name}.")
+def load_state(state_file):
+    if os.path.isfile(state_file):
+        with open(state_file, 'r') as f:
+            return json.load(f)
+    return {}
+
+
+def save_state(state_file, state):
+    with open(state_file + '.tmp', 'w') as f:
+        json.dump(state, f)
+    os.replace(state_file + '.tmp', state_file)
+
+
+def get_sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def fetch_homepage(url, state):
+    '''
+        Conditional GET of the guides homepage
+
+        returns the page content, or None when the server answers 304 or
+        the content hashes the same as last run
+    '''
+    headers = {
+        'User-Agent': get_random_user_agent(user_agents)
+    }
+    if state.get('etag'):
+        headers['If-None-Match'] = state['etag']
+    if state.get('last_modified'):
+        headers['If-Modified-Since'] = state['last_modified']
+    page = requests.get(url, headers=headers)
+    if page.status_code == 304:
+        print('Homepage not modified')
+        return None
+    page.raise_for_status()
+    state['etag'] = page.headers.get('ETag')
+    state['last_modified'] = page.headers.get('Last-Modified')
+    content_hash = get_sha256(page.content)
+    if content_hash == state.get('homepage_hash'):
+        print('Homepage content unchanged')
+        return None
+    state['homepage_hash'] = content_hash
+    return page.content
+
+
+def merge_links(link_store, links):
+    '''
+        append the links that are not in the link store yet as a delta shard
+    '''
+    existing_links = link_store.read_links()
+    print(len(existing_links))
+    new_links = set(links).difference(existing_links)
+    if not new_links:
+        print('No new links')
+        return
+    print(f'add {len(new_links)} new links to list')
+    name = link_store.append(new_links)
+    print(f"Uploaded {len(new_links)} links to {name}.")
+
 
 INFATUATION_GCS_BUCKET = 'foodie-infatuation-data'
 INFATUATION_GCS_BLOB = 'infatuation_link_list.json'
-INFATUATION_LOCAL_FILE = 'data/infatuation_link_list.json'
+INFATUATION_STATE_FILE = 'data/infatuation_url_state.json'
 INFATUATION_URL = 'https://www.theinfatuation.com/new-york/guides'
 
 if __name__ == "__main__":
@@ -44,40 +98,24 @@ if __name__ == "__main__":
     time_to_sleep = random.uniform(1, 10800)
     print(f"Sleeping for {time_to_sleep:.2f} seconds")
     time.sleep(time_to_sleep)
+    state = load_state(INFATUATION_STATE_FILE)
     # Home page URL scraping
     print('Scrape NY homepage')
-    headers = {
-        'User-Agent': get_random_user_agent(user_agents)
-    }
-    page = requests.get(INFATUATION_URL, headers=headers)
-    soup = BeautifulSoup(page.content, "html.parser")
-    # Find all links with the specified pattern
-    print('Extract guide links')
-    links = soup.find_all('a', href=lambda href: href and href.startswith("/new-york/guides/"))
-    links = ['https://www.theinfatuation.com' + x['href'] for x in links]
-    print(len(links))
-    # fetch existing URL list
-    print('download existing list')
-    download_from_gcs(
-        bucket_name=INFATUATION_GCS_BUCKET, 
-        source_blob_name=INFATUATION_GCS_BLOB, 
-        destination_file_name=INFATUATION_LOCAL_FILE
-    )
-    with open(INFATUATION_LOCAL_FILE, 'r') as json_file:
-        existing_links = json.load(json_file)
-        print(len(existing_links))
-    # merge links
-    print('add new links to list')
-    updated_links = list(set(links + existing_links))
-    print(len(updated_links))
-    # upload updated links list
-    print('upload links')
-    with open(INFATUATION_LOCAL_FILE, 'w') as json_file:
-        json.dump(updated_links, json_file)
-    upload_to_gcs(
-        bucket_name=INFATUATION_GCS_BUCKET, 
-        source_file_name=INFATUATION_LOCAL_FILE, 
-        destination_blob_name=INFATUATION_GCS_BLOB
-    )
-
-
+    content = fetch_homepage(INFATUATION_URL, state)
+    if content is not None:
+        soup = BeautifulSoup(content, "html.parser")
+        # Find all links with the specified pattern
+        print('Extract guide links')
+        links = soup.find_all('a', href=lambda href: href and href.startswith("/new-york/guides/"))
+        links = ['https://www.theinfatuation.com' + x['href'] for x in links]
+        print(len(links))
+        # append new links to the link store
+        link_store = LinkStore(
+            get_blob_store(INFATUATION_GCS_BUCKET),
+            link_store_prefix,
+            link_store_cache_dir,
+            legacy_blob=INFATUATION_GCS_BLOB
+        )
+        merge_links(link_store, links)
+        link_store.compact(min_deltas=link_store_compact_min_deltas)
+    save_state(INFATUATION_STATE_FILE, state)
@@ -0,0 +1,174 @@
+import os
+import re
+import json
+import time
+import uuid
+import hashlib
+
+import numpy as np
+
+from ranking.storage import PreconditionFailed
+
+# base-<ts>.json covers every delta up to ts, delta-<ts>-<id>.json is immutable
+SHARD_PATTERN = re.compile(r'^(?P<kind>base|delta)-(?P<ts>\d{20})(-\w+)?\.json$')
+
+
+class LinkStore():
+    '''
+        Append-only link list in a blob store
+
+        New links are written as small immutable delta shards under prefix and
+        compaction folds settled deltas into a new base shard. Readers take
+        the newest base plus the deltas after it, every shard is downloaded
+        once and then read from cache_dir. Until the first compaction the
+        monolithic legacy_blob, if given, stands in for the base.
+    '''
+
+    def __init__(self, blob_store, prefix, cache_dir, legacy_blob=None):
+        self.blob_store = blob_store
+        self.prefix = prefix
+        self.cache_dir = cache_dir
+        self.legacy_blob = legacy_blob
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _shards(self):
+        shards = []
+        for info in self.blob_store.list_blobs(prefix=self.prefix):
+            match = SHARD_PATTERN.match(info.name[len(self.prefix):])
+            if match is not None:
+                shards.append((int(match.group('ts')), match.group('kind'), info))
+        return sorted(shards, key=lambda shard: (shard[0], shard[2].name))
+
+    def _live_shards(self, shards):
+        bases = [shard for shard in shards if shard[1] == 'base']
+        if bases:
+            base = [bases[-1]]
+        else:
+            info = self.legacy_blob and self.blob_store.get_info(self.legacy_blob)
+            base = [] if info is None else [(0, 'base', info)]
+        base_ts = base[0][0] if base else -1
+        return base + [
+            shard for shard in shards if shard[1] == 'delta' and shard[0] > base_ts
+        ]
+
+    def _cache_path(self, info):
+        return os.path.join(
+            self.cache_dir, f'{info.generation}-{os.path.basename(info.name)}'
+        )
+
+    def _read_shard(self, info):
+        path = self._cache_path(info)
+        if not os.path.isfile(path):
+            data = self.blob_store.download(info.name, generation=info.generation)
+            with open(path + '.tmp', 'wb') as f:
+                f.write(data)
+            os.replace(path + '.tmp', path)
+        with open(path, 'r') as f:
+            return json.load(f)
+
+    def _read_links(self, live):
+        links = []
+        for _, _, info in live:
+            links.extend(self._read_shard(info))
+        return list(dict.fromkeys(links))
+
+    def read_links(self):
+        '''
+            all links in the store, only shards not cached yet are downloaded
+        '''
+        live = self._live_shards(self._shards())
+        links = self._read_links(live)
+        # drop cached shards that were compacted away
+        live_files = {os.path.basename(self._cache_path(info)) for _, _, info in live}
+        for file_name in os.listdir(self.cache_dir):
+            if file_name not in live_files and not file_name.endswith('.tmp'):
+                os.remove(os.path.join(self.cache_dir, file_name))
+        return links
+
+    def append(self, links):
+        '''
+            write links as a new delta shard, returns the shard name
+        '''
+        if not links:
+            return None
+        name = f'{self.prefix}delta-{time.time_ns():020d}-{uuid.uuid4().hex[:8]}.json'
+        self.blob_store.upload(name, json.dumps(sorted(links)), if_generation_match=0)
+        return name
+
+    def compact(self, min_deltas=24, settle_seconds=600):
+        '''
+            fold the live deltas older than settle_seconds into a new base
+            once there are at least min_deltas of them
+
+            shards covered by the previous base are deleted, so readers that
+            listed before this compaction can still read everything they saw
+        '''
+        shards = self._shards()
+        live = self._live_shards(shards)
+        settled_ts = time.time_ns() - int(settle_seconds * 1e9)
+        deltas = [
+            shard for shard in live if shard[1] == 'delta' and shard[0] < settled_ts
+        ]
+        if len(deltas) < min_deltas:
+            return False
+        folded = [shard for shard in live if shard[1] == 'base'] + deltas
+        ts = deltas[-1][0]
+        name = f'{self.prefix}base-{ts:020d}.json'
+        try:
+            self.blob_store.upload(
+                name, json.dumps(self._read_links(folded)), if_generation_match=0
+            )
+        except PreconditionFailed:
+            # another run already wrote this base
+            return False
+        print(f"Compacted {len(deltas)} link shards into {name}")
+        previous_bases = [
+            shard for shard in shards if shard[1] == 'base' and shard[0] < ts
+        ]
+        if previous_bases:
+            previous_ts = previous_bases[-1][0]
+            for shard_ts, kind, info in shards:
+                if shard_ts < previous_ts or (kind == 'delta' and shard_ts <= previous_ts):
+                    self.blob_store.delete(info.name)
+        return True
+
+
+def hash_links(links):
+    return np.array([
+        int.from_bytes(hashlib.blake2b(link.encode('utf-8'), digest_size=8).digest(), 'little')
+        for link in links
+    ], dtype=np.uint64)
+
+
+class ScrapedLinkIndex():
+    '''
+        Local sorted index of 64 bit hashes of already scraped links
+
+        Membership is a vectorized binary search, so checking the link list
+        does not need a scan of the scraped guides table.
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        self.hashes = np.load(path) if os.path.isfile(path) else None
+
+    @property
+    def exists(self):
+        return self.hashes is not None
+
+    def contains(self, links):
+        '''
+            boolean array, True for links already in the index
+        '''
+        hashes = hash_links(links)
+        if not self.exists or len(self.hashes) == 0:
+            return np.zeros(len(hashes), dtype=bool)
+        index = np.searchsorted(self.hashes, hashes).clip(max=len(self.hashes) - 1)
+        return self.hashes[index] == hashes
+
+    def add(self, links):
+        existing = self.hashes if self.exists else np.empty(0, dtype=np.uint64)
+        self.hashes = np.union1d(existing, hash_links(links))
+        with open(self.path + '.tmp', 'wb') as f:
+            np.save(f, self.hashes)
+        os.replace(self.path + '.tmp', self.path)
@@ -0,0 +1,131 @@
+import json
+import time
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+
+class MockPlacesServer():
+    '''
+        Local stand in for the Places API nearbysearch and details endpoints
+
+        Nearby searches return n_pages pages of fake places linked by
+        next_page_token. A page token answers INVALID_REQUEST for its first
+        invalid_token_requests uses, like a token that is not valid yet, and
+        the first details request for every place id in over_query_limit_ids
+        answers OVER_QUERY_LIMIT. Every request is kept in requests as
+        (monotonic time, endpoint, params) for assertions.
+    '''
+
+    def __init__(self, n_pages=3, places_per_page=20, invalid_token_requests=0,
+                 over_query_limit_ids=None, host='127.0.0.1', port=0):
+        self.n_pages = n_pages
+        self.places_per_page = places_per_page
+        self.invalid_token_requests = invalid_token_requests
+        self.over_query_limit_ids = set(over_query_limit_ids or [])
+        self.requests = []
+        self.lock = threading.Lock()
+        self.token_uses = {}
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def _handler(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                params = {key: values[0] for key, values in parse_qs(url.query).items()}
+                endpoint = url.path.strip('/')
+                with mock.lock:
+                    mock.requests.append((time.monotonic(), endpoint, params))
+                    if endpoint == 'nearbysearch/json':
+                        content = mock.nearby_search(params)
+                    elif endpoint == 'details/json':
+                        content = mock.details(params)
+                    else:
+                        content = None
+                if content is None:
+                    self.send_error(404)
+                    return
+                body = json.dumps(content).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def nearby_search(self, params):
+        if 'pagetoken' in params:
+            token = params['pagetoken']
+            uses = self.token_uses.get(token, 0)
+            self.token_uses[token] = uses + 1
+            if uses < self.invalid_token_requests:
+                return {'status': 'INVALID_REQUEST', 'results': []}
+            location, page = token.rsplit(':', 1)
+            page = int(page)
+        else:
+            location, page = params['location'], 0
+        results = [
+            {'place_id': f'{location}:{page}:{i}', 'name': f'Restaurant {page}-{i}'}
+            for i in range(self.places_per_page)
+        ]
+        content = {'status': 'OK', 'results': results}
+        if page + 1 < self.n_pages:
+            content['next_page_token'] = f'{location}:{page + 1}'
+        return content
+
+    def details(self, params):
+        place_id = params['place_id']
+        if place_id in self.over_query_limit_ids:
+            self.over_query_limit_ids.discard(place_id)
+            return {'status': 'OVER_QUERY_LIMIT'}
+        return {
+            'status': 'OK',
+            'result': {'place_id': place_id, 'name': f'Restaurant {place_id}'},
+        }
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(
+        description='Serve a mock Places API, point PLACES_API_BASE_URL at it'
+    )
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--n-pages', type=int, default=3)
+    parser.add_argument('--invalid-token-requests', type=int, default=1)
+    args = parser.parse_args()
+
+    server = MockPlacesServer(
+        n_pages=args.n_pages,
+        invalid_token_requests=args.invalid_token_requests,
+        port=args.port
+    )
+    print(f"Serving mock Places API at {server.base_url}")
+    server.server.serve_forever()
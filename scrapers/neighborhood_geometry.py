@@ -0,0 +1,59 @@
+import os
+
+import numpy as np
+import pandas as pd
+import shapely
+from shapely.wkt import loads
+
+NEIGHBORHOODS_TABLE = 'restaurant_data.neighborhoods'
+
+
+def sample_points_in_polygon(polygon, n, rng):
+    '''
+        Sample n uniform random points inside polygon, returns (lats, longs) arrays
+
+        Candidates are drawn from the bounding box in batches sized by the
+        polygon's share of the box and tested together with a vectorized
+        contains against the prepared polygon.
+    '''
+    shapely.prepare(polygon)
+    min_x, min_y, max_x, max_y = polygon.bounds
+    box_area = (max_x - min_x) * (max_y - min_y)
+    fill_ratio = max(polygon.area / box_area, 0.01) if box_area > 0 else 1.0
+
+    lats, longs = [], []
+    n_found = 0
+    while n_found < n:
+        n_candidates = int((n - n_found) / fill_ratio * 1.2) + 8
+        x = rng.uniform(min_x, max_x, n_candidates)
+        y = rng.uniform(min_y, max_y, n_candidates)
+        inside = shapely.contains_xy(polygon, x, y)
+        longs.append(x[inside])
+        lats.append(y[inside])
+        n_found += int(inside.sum())
+    return np.concatenate(lats)[:n], np.concatenate(longs)[:n]
+
+
+def load_neighborhoods(client, backend, cache_file):
+    '''
+        Load neighborhood polygons with parsed geometries
+
+        Parsed geometries are cached in cache_file together with the table's
+        last modified time, the table is only queried and re-parsed after it
+        changes
+    '''
+    modified = client.get_table(NEIGHBORHOODS_TABLE).modified.isoformat()
+    if os.path.isfile(cache_file):
+        cached = pd.read_pickle(cache_file)
+        if cached['modified'] == modified:
+            return cached['neighborhoods']
+
+    query = f"""
+        SELECT name, borough, any_value(geo) as geo FROM {NEIGHBORHOODS_TABLE}
+        group by 1, 2
+    """
+    df = backend.query(query)
+    df['geometry'] = [loads(geo) for geo in df['geo']]
+    df = df.drop(columns='geo')
+    pd.to_pickle({'modified': modified, 'neighborhoods': df}, cache_file)
+    return df
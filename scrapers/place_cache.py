@@ -0,0 +1,109 @@
+import json
+import sqlite3
+import time
+
+
+class PlaceDetailsCache():
+    '''
+        Local SQLite cache of Places API detail fields keyed by place_id
+
+        Every field is stored with its own fetch time and goes stale after its
+        own TTL, so a place only needs its stale fields re-queried. Places
+        are evicted least recently used first once there are more than
+        max_places. Lookups are counted as hits (all fields fresh), partial
+        hits (some fields stale) and misses (place not cached).
+    '''
+
+    def __init__(self, path, field_ttl_days, max_places=100000):
+        self.field_ttl_seconds = {
+            field: ttl * 24 * 3600 for field, ttl in field_ttl_days.items()
+        }
+        self.max_places = max_places
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript('''
+            create table if not exists places (
+                place_id text primary key,
+                last_accessed real
+            );
+            create table if not exists place_fields (
+                place_id text,
+                field text,
+                value text,
+                fetched_at real,
+                primary key (place_id, field)
+            );
+        ''')
+        self.hits = 0
+        self.partial_hits = 0
+        self.misses = 0
+
+    def lookup(self, place_id):
+        '''
+            returns (cached fields, list of fields to re-query) for place_id
+        '''
+        now = time.time()
+        rows = self.connection.execute(
+            'select field, value, fetched_at from place_fields where place_id = ?',
+            (place_id,)
+        ).fetchall()
+        cached = {}
+        for field, value, fetched_at in rows:
+            if now - fetched_at < self.field_ttl_seconds.get(field, 0):
+                cached[field] = json.loads(value)
+        stale_fields = [f for f in self.field_ttl_seconds if f not in cached]
+        if not rows:
+            self.misses += 1
+        elif stale_fields:
+            self.partial_hits += 1
+        else:
+            self.hits += 1
+        if rows:
+            with self.connection:
+                self.connection.execute(
+                    'update places set last_accessed = ? where place_id = ?',
+                    (now, place_id)
+                )
+        return cached, stale_fields
+
+    def update(self, place_id, result, fields):
+        '''
+            store fetched fields for place_id, fields missing from result are
+            stored as None so they are not re-queried until stale
+        '''
+        now = time.time()
+        with self.connection:
+            self.connection.execute(
+                'insert or replace into places (place_id, last_accessed) values (?, ?)',
+                (place_id, now)
+            )
+            self.connection.executemany(
+                'insert or replace into place_fields values (?, ?, ?, ?)',
+                [(place_id, f, json.dumps(result.get(f)), now) for f in fields]
+            )
+
+    def evict(self):
+        '''
+            drop least recently used places beyond max_places
+        '''
+        with self.connection:
+            self.connection.execute('''
+                delete from places where place_id in (
+                    select place_id from places
+                    order by last_accessed desc
+                    limit -1 offset ?
+                )
+            ''', (self.max_places,))
+            self.connection.execute('''
+                delete from place_fields
+                where place_id not in (select place_id from places)
+            ''')
+
+    def log_stats(self):
+        print(
+            f"Place cache: {self.hits} hits, {self.partial_hits} partial hits, "
+            f"{self.misses} misses"
+        )
+
+    def close(self):
+        self.evict()
+        self.connection.close()
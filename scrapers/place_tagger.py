@@ -0,0 +1,231 @@
+import os
+import argparse
+import hashlib
+
+import numpy as np
+import pandas as pd
+import shapely
+from shapely.strtree import STRtree
+
+PLACE_TAG_MAPPING_TABLE = 'restaurant_data.place_tag_mapping'
+PLACE_TAG_MAPPING_UPDATES_TABLE = 'restaurant_data.place_tag_mapping_updates'
+
+place_tag_mapping_schema = [
+  {
+    "name": "place_id",
+    "type": "STRING",
+    "mode": "NULLABLE"
+  },
+  {
+    "name": "place_tag",
+    "type": "INTEGER",
+    "mode": "NULLABLE"
+  },
+  {
+    "name": "geo",
+    "type": "STRING",
+    "mode": "NULLABLE"
+  },
+  {
+    "name": "place_index_version",
+    "type": "STRING",
+    "mode": "NULLABLE"
+  },
+]
+
+
+class PlaceTagIndex():
+    '''
+        STRtree over place tag geometries (dim_place polygons)
+
+        Places get every tag whose polygon contains them, the same as the
+        ST_CONTAINS join this replaces. With nearest, places get the single
+        tag of the nearest geometry instead, e.g. for the neighborhoods.csv
+        seed that only holds neighborhood centroids and would tag nothing by
+        containment. nearest is opt in as it changes the semantics: every
+        place gets exactly one tag, however far away it is.
+    '''
+
+    def __init__(self, tag_ids, tag_geos, nearest=False):
+        self.tag_ids = np.asarray(tag_ids)
+        self.geometries = shapely.from_wkt(np.asarray(tag_geos, dtype=object))
+        self.tree = STRtree(self.geometries)
+        self.nearest = nearest
+        # changes whenever any tag geometry or the mode changes, forcing a full re-tag
+        digest = hashlib.sha1()
+        digest.update(f'nearest={nearest}\n'.encode('utf-8'))
+        for tag_id, geo in sorted(zip(map(str, tag_ids), tag_geos)):
+            digest.update(f'{tag_id}|{geo}\n'.encode('utf-8'))
+        self.version = digest.hexdigest()
+
+    def assign(self, place_ids, place_geos):
+        '''
+            returns a place_id -> place_tag DataFrame, places without a tag
+            keep one row with a null place_tag
+        '''
+        place_ids = np.asarray(place_ids, dtype=object)
+        place_geos = np.asarray(place_geos, dtype=object)
+        points = shapely.from_wkt(place_geos)
+        if self.nearest:
+            place_index, tag_index = self.tree.query_nearest(points, all_matches=False)
+        else:
+            place_index, tag_index = self.tree.query(points, predicate='within')
+        tagged = pd.DataFrame({
+            'place_id': place_ids[place_index],
+            'place_tag': self.tag_ids[tag_index],
+            'geo': place_geos[place_index],
+        })
+        untagged_mask = np.ones(len(place_ids), dtype=bool)
+        untagged_mask[place_index] = False
+        untagged = pd.DataFrame({
+            'place_id': place_ids[untagged_mask],
+            'place_tag': None,
+            'geo': place_geos[untagged_mask],
+        })
+        mapping = pd.concat([tagged, untagged], ignore_index=True)
+        mapping['place_tag'] = mapping['place_tag'].astype('Int64')
+        mapping['place_index_version'] = self.version
+        return mapping
+
+
+def get_changed_places(places_df, mapping_df, version):
+    '''
+        places that are new, moved since they were tagged or were tagged
+        against a different version of the index
+    '''
+    tagged = mapping_df[['place_id', 'geo', 'place_index_version']] \
+        .drop_duplicates('place_id')
+    merged = places_df.merge(tagged, on='place_id', how='left', suffixes=('', '_tagged'))
+    changed_mask = merged['geo_tagged'].isna() \
+        | (merged['geo'] != merged['geo_tagged']) \
+        | (merged['place_index_version'] != version)
+    return merged.loc[changed_mask, ['place_id', 'geo']]
+
+
+def update_mapping(places_df, place_tags_df, mapping_df, nearest=False):
+    '''
+        returns (mapping rows for changed places, full updated mapping)
+    '''
+    index = PlaceTagIndex(place_tags_df['id'], place_tags_df['geo'], nearest=nearest)
+    places_df = places_df.dropna(subset=['geo'])
+    changed_df = get_changed_places(places_df, mapping_df, index.version)
+    updates_df = index.assign(changed_df['place_id'], changed_df['geo'])
+    mapping_df = pd.concat([
+        mapping_df[~mapping_df['place_id'].isin(changed_df['place_id'])],
+        updates_df,
+    ], ignore_index=True)
+    print(f"Re-tagged {len(changed_df)} of {len(places_df)} places")
+    return updates_df, mapping_df
+
+
+def run_local(places_csv, place_tags_csv, output_csv, id_col, geo_col, nearest=False):
+    '''
+        tag places from a CSV or Parquet file (place_id, geo) against a CSV of tag geometries,
+        e.g. the neighborhoods.csv dbt seed with nearest, and keep the mapping in output_csv
+    '''
+    if places_csv.endswith('.parquet'):
+        places_df = pd.read_parquet(places_csv, columns=['place_id', 'geo'])
+    else:
+        places_df = pd.read_csv(places_csv)[['place_id', 'geo']]
+    place_tags_df = pd.read_csv(place_tags_csv) \
+        .rename(columns={id_col: 'id', geo_col: 'geo'})[['id', 'geo']]
+    if os.path.isfile(output_csv):
+        mapping_df = pd.read_csv(output_csv, dtype={'place_tag': 'Int64'})
+    else:
+        mapping_df = pd.DataFrame(columns=[s['name'] for s in place_tag_mapping_schema])
+    _, mapping_df = update_mapping(places_df, place_tags_df, mapping_df, nearest=nearest)
+    mapping_df.to_csv(output_csv, index=False)
+
+
+def run_bigquery(project_id):
+    '''
+        tag the latest geo of every scraped place against dim_place and merge
+        the changed rows into restaurant_data.place_tag_mapping
+    '''
+    from google.api_core.exceptions import NotFound
+    from ranking.data_access import get_backend, get_bigquery_client
+
+    client = get_bigquery_client(project_id, location="US")
+    backend = get_backend(project_id, location="US")
+    places_df = backend.query("""
+        select
+            place_id,
+            max_by(geo, updated_at) as geo
+        from restaurant_data.google_maps_place_logs
+        group by 1
+    """)
+    place_tags_df = backend.query("""
+        select
+            id,
+            geo
+        from application_prod.dim_place
+        where geo is not null
+    """)
+    try:
+        client.get_table(PLACE_TAG_MAPPING_TABLE)
+        mapping_df = backend.query(f"""
+            select
+                place_id,
+                geo,
+                place_index_version
+            from {PLACE_TAG_MAPPING_TABLE}
+        """)
+        mapping_exists = True
+    except NotFound:
+        mapping_df = pd.DataFrame(columns=['place_id', 'geo', 'place_index_version'])
+        mapping_exists = False
+
+    updates_df, _ = update_mapping(places_df, place_tags_df, mapping_df)
+    if updates_df.empty:
+        return
+    if not mapping_exists:
+        backend.write_dataframe(
+            updates_df, PLACE_TAG_MAPPING_TABLE, schema=place_tag_mapping_schema
+        )
+        return
+    backend.write_dataframe(
+        updates_df,
+        PLACE_TAG_MAPPING_UPDATES_TABLE,
+        schema=place_tag_mapping_schema,
+        write_disposition='WRITE_TRUNCATE'
+    )
+    client.query(f"""
+        delete from {PLACE_TAG_MAPPING_TABLE}
+        where place_id in (select place_id from {PLACE_TAG_MAPPING_UPDATES_TABLE});
+        insert into {PLACE_TAG_MAPPING_TABLE}
+        select * from {PLACE_TAG_MAPPING_UPDATES_TABLE};
+    """).result()
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description='Precompute place_id -> place_tag mapping')
+    parser.add_argument('--local', action='store_true', help='run against local CSV files')
+    parser.add_argument('--places-csv', default='data/google_places.parquet')
+    parser.add_argument('--place-tags-csv', default='../data_warehouse/seeds/neighborhoods.csv')
+    parser.add_argument('--id-col', default='OBJECTID')
+    parser.add_argument('--geo-col', default='the_geom')
+    parser.add_argument('--output-csv', default='data/place_tag_mapping.csv')
+    parser.add_argument(
+        '--nearest', action='store_true',
+        help='tag places with the nearest tag geometry instead of by containment, for point seeds'
+    )
+    args = parser.parse_args()
+
+    if args.local:
+        run_local(
+            args.places_csv,
+            args.place_tags_csv,
+            args.output_csv,
+            args.id_col,
+            args.geo_col,
+            nearest=args.nearest
+        )
+    else:
+        import environ
+
+        # same local .env the scrapers read PROJECT_ID from
+        env_file = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".env")
+        if os.path.isfile(env_file):
+            environ.Env.read_env(env_file)
+        run_bigquery(os.environ['PROJECT_ID'])
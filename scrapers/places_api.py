@@ -0,0 +1,146 @@
+import os
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+PLACES_API_BASE_URL = 'https://maps.googleapis.com/maps/api/place'
+
+PLACE_DETAIL_FIELDS = [
+    'formatted_address', 'name', 'place_id', 'business_status',
+    'url', 'website', 'editorial_summary', 'price_level', 'rating',
+    'user_ratings_total', 'geometry'
+]
+
+# statuses worth retrying after a backoff
+RETRY_STATUSES = {'OVER_QUERY_LIMIT', 'UNKNOWN_ERROR'}
+RETRY_HTTP_CODES = {429, 500, 502, 503, 504}
+
+
+class RateLimiter():
+    '''
+        Spaces out calls across threads to at most qps calls per second
+    '''
+
+    def __init__(self, qps):
+        self.interval = 1.0 / qps
+        self.lock = threading.Lock()
+        self.next_call = time.monotonic()
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            call_at = max(now, self.next_call)
+            self.next_call = call_at + self.interval
+        time.sleep(max(call_at - now, 0))
+
+
+class PlacesClient():
+    '''
+        Google Places API client over a pooled requests.Session
+
+        Requests are rate limited to qps, retried with exponential backoff on
+        OVER_QUERY_LIMIT / transient HTTP errors, and detail lookups for many
+        places run on a bounded thread pool with results kept in input order.
+        Point base_url (or PLACES_API_BASE_URL in the environment) at a local
+        mock_places_server.py to run without the real API.
+    '''
+
+    def __init__(self, api_key, base_url=None, max_workers=8, qps=10,
+                 max_retries=5, backoff_seconds=1.0, timeout=30):
+        self.api_key = api_key
+        self.base_url = base_url or os.environ.get(
+            'PLACES_API_BASE_URL', PLACES_API_BASE_URL
+        )
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.timeout = timeout
+        self.rate_limiter = RateLimiter(qps)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def get_query_content(self, query):
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.wait()
+            try:
+                r = self.session.get(query, timeout=self.timeout)
+                retry = r.status_code in RETRY_HTTP_CODES
+                content = None if retry else r.json()
+            except requests.ConnectionError:
+                if attempt == self.max_retries:
+                    raise
+                retry, content = True, None
+            if content is not None and content.get('status') in RETRY_STATUSES:
+                retry = True
+            if not retry or attempt == self.max_retries:
+                break
+            # exponential backoff with jitter
+            time.sleep(self.backoff_seconds * 2 ** attempt * random.uniform(1, 1.5))
+        if content is None:
+            r.raise_for_status()
+        return content
+
+    def get_nearby_places(self, lat, long, radius=50):
+        keyword = 'restaurant'
+        location = f'{lat},{long}'
+        query = f'{self.base_url}/nearbysearch/json?location={location}&radius={radius}&keyword={keyword}&key={self.api_key}'
+        content = self.get_query_content(query)
+        return content, query
+
+    def get_nearby_places_pages(self, lat, long, radius=50, max_pages=3,
+                                page_token_delay=2.0, max_token_retries=5):
+        '''
+            run a nearby search and follow next_page_token through all pages
+
+            a page token only becomes valid a short while after it is issued,
+            so wait page_token_delay before each follow-up request and retry
+            while the API still answers INVALID_REQUEST
+        '''
+        content, query = self.get_nearby_places(lat, long, radius=radius)
+        pages = [(content, query)]
+        while len(pages) < max_pages and content.get('next_page_token'):
+            query = f"{self.base_url}/nearbysearch/json?pagetoken={content['next_page_token']}&key={self.api_key}"
+            for _ in range(max_token_retries):
+                time.sleep(page_token_delay)
+                content = self.get_query_content(query)
+                if content.get('status') != 'INVALID_REQUEST':
+                    break
+            pages.append((content, query))
+        return pages
+
+    def get_nearby_places_pages_many(self, points, radius=50, max_pages=3):
+        '''
+            drain the nearby search pages for many (lat, long) points
+            concurrently, so the page token waits of one point overlap with
+            requests for the others; results in points order
+        '''
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return list(executor.map(
+                lambda point: self.get_nearby_places_pages(
+                    point[0], point[1], radius=radius, max_pages=max_pages
+                ),
+                points
+            ))
+
+    def get_place_details(self, place_id, fields=None):
+        fields = ','.join(fields or PLACE_DETAIL_FIELDS)
+        query = f'{self.base_url}/details/json?fields={fields}&place_id={place_id}&key={self.api_key}'
+        content = self.get_query_content(query)
+        return content, query
+
+    def get_place_details_many(self, place_ids, fields_list=None):
+        '''
+            fetch details for many places concurrently, results in place_ids order
+
+            fields_list optionally gives the fields to request per place
+        '''
+        if fields_list is None:
+            fields_list = [None] * len(place_ids)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return list(executor.map(self.get_place_details, place_ids, fields_list))
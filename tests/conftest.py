@@ -0,0 +1,5 @@
+import os
+import sys
+
+# scrapers import their sibling modules by name, as when run from scrapers/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), 'scrapers'))
@@ -0,0 +1,15 @@
+from benchmark_guide_parsers import benchmark, load_pages, make_pages
+
+
+def test_backends_agree_on_synthetic_pages():
+    pages = make_pages(n_guides=3, n_venues=5)
+    mismatches = benchmark(pages, repeat=1)
+    assert mismatches == {backend: [] for backend in mismatches}
+    assert len(mismatches) >= 2
+
+
+def test_load_pages_reads_saved_html(tmp_path):
+    for name, content in make_pages(n_guides=2, n_venues=2):
+        (tmp_path / name).write_bytes(content)
+    (tmp_path / 'notes.txt').write_text('not a page')
+    assert [name for name, _ in load_pages(str(tmp_path))] == ['guide-0.html', 'guide-1.html']
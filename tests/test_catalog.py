@@ -0,0 +1,108 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ranking.catalog import RestaurantCatalog, get_catalog_key
+from ranking.samplers import NeighborhoodSampler
+
+
+def make_restaurant_df():
+    return pd.DataFrame({
+        'restaurant_id': [30, 10, 50, 20, 40, 60],
+        'restaurant_neighborhood_id': ['b', 'a', None, 'b', 'a', 'c'],
+        'name': ['Thirty', 'Ten', 'Fifty', 'Twenty', 'Forty', 'Sixty'],
+        'rating': [4.5, 3.0, 4.0, 5.0, 2.5, 3.5],
+    })
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    return RestaurantCatalog.build(
+        make_restaurant_df(),
+        str(tmp_path / 'catalog'),
+        'restaurant_id',
+        sort_by=['restaurant_neighborhood_id']
+    )
+
+
+def test_build_sorts_rows_by_sort_by_then_id(catalog):
+    assert catalog.n_rows == 6
+    # missing neighborhoods (code -1) sort first
+    np.testing.assert_array_equal(catalog.column('restaurant_id'), [50, 10, 40, 20, 30, 60])
+    assert catalog.dictionary('restaurant_neighborhood_id').tolist() == ['a', 'b', 'c']
+    np.testing.assert_array_equal(
+        catalog.codes('restaurant_neighborhood_id'), [-1, 0, 0, 1, 1, 2]
+    )
+
+
+def test_positions_and_decode_round_trip(catalog):
+    positions = catalog.positions([20, 999, 60])
+    np.testing.assert_array_equal(positions, [3, -1, 5])
+    assert catalog.decode('name', positions).tolist() == ['Twenty', None, 'Sixty']
+    assert catalog.decode('rating', positions).tolist() == [5.0, None, 3.5]
+    assert catalog.decode('restaurant_neighborhood_id', catalog.positions([50, 40])).tolist() == [None, 'a']
+
+
+def test_to_dataframe_matches_source(catalog):
+    expected = make_restaurant_df().sort_values('restaurant_id').reset_index(drop=True)
+    df = catalog.to_dataframe().sort_values('restaurant_id').reset_index(drop=True)
+    pd.testing.assert_frame_equal(df[expected.columns], expected, check_dtype=False)
+
+
+def test_from_catalog_samples_like_from_dataframe(catalog):
+    user_df = pd.DataFrame({
+        'user_id': [1, 2, 3],
+        'user_neighborhood_id': ['a', 'b', 'unknown'],
+    })
+    restaurant_df = make_restaurant_df()
+    neighborhoods = dict(zip(restaurant_df['restaurant_id'], restaurant_df['restaurant_neighborhood_id']))
+    sampler = NeighborhoodSampler.from_catalog(catalog, seed=0)
+    for _ in range(10):
+        predictions = sampler.sample(user_df, n=3, n_in_zip=2)
+        assert predictions['user_id'].tolist() == [1, 2, 3]
+        for neighborhood, restaurant_list in zip(
+            user_df['user_neighborhood_id'], predictions['restaurant_list']
+        ):
+            assert len(restaurant_list) == 3
+            assert len(set(restaurant_list)) == 3
+            in_neighborhood = [r for r in restaurant_list if neighborhoods[r] == neighborhood]
+            expected_in = 0 if neighborhood == 'unknown' else 2
+            assert len(in_neighborhood) == expected_in
+
+
+def test_from_catalog_requires_neighborhood_sort(tmp_path):
+    catalog = RestaurantCatalog.build(make_restaurant_df(), str(tmp_path / 'catalog'), 'restaurant_id')
+    with pytest.raises(ValueError):
+        NeighborhoodSampler.from_catalog(catalog)
+
+
+def test_open_or_build_builds_once_and_prunes_old_keys(tmp_path):
+    catalog_dir = str(tmp_path / 'catalogs')
+    loads = []
+
+    def open_catalog(df):
+        def load_df():
+            loads.append(1)
+            return df
+        key = get_catalog_key(df, 'restaurant_id')
+        return RestaurantCatalog.open_or_build(key, load_df, 'restaurant_id', catalog_dir=catalog_dir)
+
+    df = make_restaurant_df()
+    first = open_catalog(df)
+    assert open_catalog(df).path == first.path
+    assert len(loads) == 1
+
+    # distinct mtimes, so recency does not depend on timer resolution
+    os.utime(first.path, (1000, 1000))
+    paths = [first.path]
+    for i in range(1, 5):
+        paths.append(open_catalog(df.assign(rating=df['rating'] + i)).path)
+        os.utime(paths[-1], (1000 + i, 1000 + i))
+    assert sorted(os.listdir(catalog_dir)) == sorted(os.path.basename(p) for p in paths[-3:])
+
+    # reopening marks a catalog as recently used
+    open_catalog(df.assign(rating=df['rating'] + 2))
+    RestaurantCatalog.prune(catalog_dir, keep=1)
+    assert os.listdir(catalog_dir) == [os.path.basename(paths[2])]
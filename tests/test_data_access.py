@@ -0,0 +1,47 @@
+import datetime
+from types import SimpleNamespace
+
+from ranking.data_access import BigQueryBackend
+
+
+def make_backend(results):
+    backend = BigQueryBackend.__new__(BigQueryBackend)
+    backend.queries = []
+    results = list(results)
+
+    def run(query):
+        backend.queries.append(query)
+        return results.pop(0)
+
+    backend._run = run
+    return backend
+
+
+def test_list_partitions_reads_day_partitions():
+    backend = make_backend([[
+        SimpleNamespace(partition_id='20240101', last_modified=7),
+        SimpleNamespace(partition_id='__NULL__', last_modified=1),
+    ]])
+    assert backend.list_partitions('warehouse_feature_store.t') == {'2024-01-01': 7}
+    assert '`warehouse_feature_store.INFORMATION_SCHEMA.PARTITIONS`' in backend.queries[0]
+
+
+def test_list_partitions_falls_back_for_unpartitioned_tables():
+    backend = make_backend([
+        [SimpleNamespace(partition_id=None, last_modified=5)],
+        [SimpleNamespace(ds='2024-01-01'), SimpleNamespace(ds='2024-01-02')],
+    ])
+    partitions = backend.list_partitions('foodie-355420.warehouse_feature_store.t')
+
+    assert partitions == {'2024-01-01': None, '2024-01-02': None}
+    assert '`foodie-355420.warehouse_feature_store.INFORMATION_SCHEMA.PARTITIONS`' in backend.queries[0]
+    assert '`foodie-355420.warehouse_feature_store.t`' in backend.queries[1]
+
+
+def test_get_last_modified_reads_table_metadata():
+    backend = make_backend([])
+    modified = datetime.datetime(2024, 1, 3, tzinfo=datetime.timezone.utc)
+    backend.client = SimpleNamespace(get_table=lambda table: SimpleNamespace(modified=modified))
+
+    assert backend.get_last_modified('warehouse_feature_store.t') == int(modified.timestamp() * 1000)
+    assert backend.queries == []
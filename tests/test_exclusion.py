@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from ranking.exclusion import SeenRestaurantIndex
+
+
+def make_index(block_size=4096):
+    restaurant_ids = [50, 10, 40, 20, 30, 60, 70, 80, 90, 100]
+    seen_lists = [
+        [10, 20, 999],
+        None,
+        [50, 10, 40, 20, 30, 60, 70],
+    ]
+    return SeenRestaurantIndex(restaurant_ids, seen_lists, block_size=block_size)
+
+
+def test_ordinals_map_ids_to_catalog_positions():
+    index = make_index()
+    np.testing.assert_array_equal(index.ordinals([50, 20, 999]), [0, 3, -1])
+
+
+def test_is_seen_ignores_unknown_ids():
+    index = make_index()
+    ordinals = index.ordinals([10, 20, 30])
+    np.testing.assert_array_equal(index.is_seen([0, 0, 0], ordinals), [True, True, False])
+    np.testing.assert_array_equal(index.is_seen([1, 1, 1], ordinals), [False, False, False])
+
+
+@pytest.mark.parametrize('block_size', [1, 4096])
+def test_sample_unseen_excludes_seen_and_ineligible(block_size):
+    index = make_index(block_size=block_size)
+    eligible = np.ones(index.n_restaurants, dtype=bool)
+    eligible[index.ordinals([90])] = False
+    for seed in range(20):
+        selection = index.sample_unseen(2, np.random.default_rng(seed), eligible=eligible)
+        assert selection.shape == (3, 2)
+        for user, row in enumerate(selection):
+            assert len(set(row.tolist())) == 2
+            assert not index.is_seen(np.full(2, user), row).any()
+            assert eligible[row].all()
+    # user 2 has exactly 80 and 100 left once 90 is ineligible
+    selection = index.sample_unseen(2, np.random.default_rng(0), eligible=eligible)
+    assert set(index.restaurant_ids[selection[2]].tolist()) == {80, 100}
+
+
+def test_sample_unseen_raises_when_too_few_left():
+    index = make_index()
+    with pytest.raises(ValueError):
+        index.sample_unseen(4, np.random.default_rng(0))
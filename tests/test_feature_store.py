@@ -0,0 +1,107 @@
+import os
+
+import pandas as pd
+import pytest
+
+from ranking.feature_store import FeatureStoreClient
+from ranking.partition_cache import PartitionCache
+
+
+def write_partition(data_dir, ds, values, mtime):
+    path = os.path.join(data_dir, 'warehouse_feature_store', 'features', f'ds={ds}')
+    os.makedirs(path, exist_ok=True)
+    part = os.path.join(path, 'part-0.parquet')
+    pd.DataFrame({'user_id': range(len(values)), 'value': values}).to_parquet(part)
+    os.utime(part, (mtime, mtime))
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    data_dir = str(tmp_path / 'data')
+    monkeypatch.setenv('FOODIE_DATA_BACKEND', 'local')
+    monkeypatch.setenv('FOODIE_LOCAL_DATA_DIR', data_dir)
+    monkeypatch.setenv('FOODIE_PARTITION_CACHE_DIR', str(tmp_path / 'cache'))
+    write_partition(data_dir, '2024-01-01', [1.0, 2.0], mtime=1000)
+    write_partition(data_dir, '2024-01-02', [3.0, 4.0], mtime=2000)
+    return data_dir
+
+
+@pytest.fixture
+def list_calls(monkeypatch):
+    calls = []
+    list_partitions = PartitionCache.list_partitions
+
+    def counted(self):
+        calls.append(self.table_id)
+        return list_partitions(self)
+
+    monkeypatch.setattr(PartitionCache, 'list_partitions', counted)
+    return calls
+
+
+def make_client(data_dir):
+    # backends are cached per project, a fresh project sees this test's data
+    return FeatureStoreClient(project_id=data_dir)
+
+
+def test_get_skips_listing_while_table_is_unchanged(data_dir, list_calls):
+    client = make_client(data_dir)
+    assert client.get('features')['value'].tolist() == [3.0, 4.0]
+    assert client.get('features')['value'].tolist() == [3.0, 4.0]
+    assert len(list_calls) == 1
+
+
+def test_get_picks_up_new_partitions(data_dir, list_calls):
+    client = make_client(data_dir)
+    client.get('features')
+    write_partition(data_dir, '2024-01-03', [5.0], mtime=3000)
+    assert client.get('features')['value'].tolist() == [5.0]
+    assert len(list_calls) == 2
+    assert sorted(client.get_cache('features').cached_partitions()) == ['2024-01-02', '2024-01-03']
+
+
+def test_get_without_refresh_or_with_cached_ds_stays_local(data_dir, list_calls):
+    client = make_client(data_dir)
+    client.get('features', ds='2024-01-01')
+    assert client.get('features', ds='2024-01-01')['value'].tolist() == [1.0, 2.0]
+    assert client.get('features', refresh=False)['value'].tolist() == [1.0, 2.0]
+    assert len(list_calls) == 1
+
+
+def test_sync_refetches_newer_partitions_only(data_dir):
+    cache = PartitionCache('warehouse_feature_store.features', project_id=data_dir)
+    partitions = cache.list_partitions()
+    assert partitions == {'2024-01-01': 1000000, '2024-01-02': 2000000}
+    assert cache.sync(partitions) == ['2024-01-01', '2024-01-02']
+    assert cache.sync(partitions) == []
+
+    write_partition(data_dir, '2024-01-01', [7.0], mtime=4000)
+    assert cache.sync(cache.list_partitions()) == ['2024-01-01']
+    assert cache.read('2024-01-01')['value'].tolist() == [7.0]
+
+
+def test_sync_fetches_partitions_without_times_only_when_missing(data_dir):
+    cache = PartitionCache('warehouse_feature_store.features', project_id=data_dir)
+    cache.sync({'2024-01-01': 1000000})
+    assert cache.sync({'2024-01-01': None, '2024-01-02': None}) == ['2024-01-02']
+    assert cache.cached_partitions() == {'2024-01-01': 1000000, '2024-01-02': None}
+    # a cached copy of unknown age is stale once the table reports a time
+    assert cache.sync({'2024-01-02': 2000000}) == ['2024-01-02']
+
+
+def test_prune_removes_partitions_before_min_ds(data_dir):
+    cache = PartitionCache('warehouse_feature_store.features', project_id=data_dir)
+    cache.sync(cache.list_partitions())
+    assert cache.prune('2024-01-02') == ['2024-01-01']
+    assert list(cache.cached_partitions()) == ['2024-01-02']
+    assert sorted(os.listdir(cache.cache_dir)) == ['ds=2024-01-02.json', 'ds=2024-01-02.parquet']
+
+
+def test_get_keeps_the_newest_partitions(data_dir, monkeypatch):
+    monkeypatch.setattr('ranking.feature_store.FEATURE_STORE_PARTITIONS_KEPT', 2)
+    client = make_client(data_dir)
+    client.get('features', ds='2024-01-01')
+    client.get('features')
+    write_partition(data_dir, '2024-01-03', [5.0], mtime=3000)
+    client.get('features')
+    assert sorted(client.get_cache('features').cached_partitions()) == ['2024-01-02', '2024-01-03']
@@ -0,0 +1,26 @@
+from places_api import PlacesClient
+from mock_places_server import MockPlacesServer
+
+
+def test_nearby_pages_follow_tokens_until_valid():
+    with MockPlacesServer(n_pages=3, invalid_token_requests=1) as server:
+        client = PlacesClient('key', base_url=server.base_url)
+        pages = client.get_nearby_places_pages(
+            40.7, -74.0, max_pages=3, page_token_delay=0
+        )
+        endpoints = [endpoint for _, endpoint, _ in server.requests]
+
+    assert [content['status'] for content, _ in pages] == ['OK', 'OK', 'OK']
+    place_ids = [place['place_id'] for content, _ in pages for place in content['results']]
+    assert len(set(place_ids)) == 3 * 20
+    assert 'next_page_token' not in pages[-1][0]
+    # one INVALID_REQUEST retry per page token
+    assert endpoints == ['nearbysearch/json'] * 5
+
+
+def test_nearby_pages_stop_at_max_pages():
+    with MockPlacesServer(n_pages=5) as server:
+        client = PlacesClient('key', base_url=server.base_url)
+        pages = client.get_nearby_places_pages(40.7, -74.0, max_pages=2, page_token_delay=0)
+
+    assert len(pages) == 2
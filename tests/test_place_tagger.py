@@ -0,0 +1,82 @@
+import os
+
+import pandas as pd
+
+from place_tagger import PlaceTagIndex, run_local, update_mapping
+
+SEED_CSV = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), 'data_warehouse', 'seeds', 'neighborhoods.csv'
+)
+
+
+def seed_point(name):
+    seed = pd.read_csv(SEED_CSV)
+    row = seed[seed['Name'] == name].iloc[0]
+    lon, lat = row['the_geom'][len('POINT ('):-1].split()
+    return int(row['OBJECTID']), float(lon), float(lat)
+
+
+def near(name, offset=0.0005):
+    tag, lon, lat = seed_point(name)
+    return tag, f'POINT ({lon + offset} {lat + offset})'
+
+
+def read_mapping(output_csv):
+    mapping = pd.read_csv(output_csv, dtype={'place_tag': 'Int64'})
+    return dict(zip(mapping['place_id'], mapping['place_tag']))
+
+
+def test_run_local_tags_and_retags_only_changed_places(tmp_path, capsys):
+    places_csv = str(tmp_path / 'places.csv')
+    output_csv = str(tmp_path / 'place_tag_mapping.csv')
+    wakefield, wakefield_geo = near('Wakefield')
+    co_op_city, co_op_city_geo = near('Co-op City')
+
+    pd.DataFrame({
+        'place_id': ['a', 'b'],
+        'geo': [wakefield_geo, co_op_city_geo],
+    }).to_csv(places_csv, index=False)
+    run_local(places_csv, SEED_CSV, output_csv, 'OBJECTID', 'the_geom', nearest=True)
+    assert read_mapping(output_csv) == {'a': wakefield, 'b': co_op_city}
+    assert 'Re-tagged 2 of 2 places' in capsys.readouterr().out
+
+    # unchanged places are not re-tagged
+    run_local(places_csv, SEED_CSV, output_csv, 'OBJECTID', 'the_geom', nearest=True)
+    assert 'Re-tagged 0 of 2 places' in capsys.readouterr().out
+
+    # b moves to Wakefield and c is new
+    pd.DataFrame({
+        'place_id': ['a', 'b', 'c'],
+        'geo': [wakefield_geo, near('Wakefield', offset=-0.0005)[1], co_op_city_geo],
+    }).to_csv(places_csv, index=False)
+    run_local(places_csv, SEED_CSV, output_csv, 'OBJECTID', 'the_geom', nearest=True)
+    assert 'Re-tagged 2 of 3 places' in capsys.readouterr().out
+    assert read_mapping(output_csv) == {'a': wakefield, 'b': wakefield, 'c': co_op_city}
+
+
+def test_update_mapping_retags_everything_when_the_index_changes():
+    places_df = pd.DataFrame({
+        'place_id': ['a', 'b'],
+        'geo': ['POINT (0.5 0.5)', 'POINT (1.5 0.5)'],
+    })
+    place_tags_df = pd.DataFrame({
+        'id': [1, 2],
+        'geo': ['POLYGON ((0 0, 1 0, 1 1, 0 1, 0 0))', 'POLYGON ((1 0, 2 0, 2 1, 1 1, 1 0))'],
+    })
+    empty = pd.DataFrame(columns=['place_id', 'place_tag', 'geo', 'place_index_version'])
+    _, mapping_df = update_mapping(places_df, place_tags_df, empty)
+
+    place_tags_df.loc[1, 'geo'] = 'POLYGON ((0 0, 2 0, 2 1, 0 1, 0 0))'
+    updates_df, mapping_df = update_mapping(places_df, place_tags_df, mapping_df)
+    assert len(updates_df) == 3
+    assert sorted(zip(mapping_df['place_id'], mapping_df['place_tag'])) == [('a', 1), ('a', 2), ('b', 2)]
+
+
+def test_containment_does_not_fall_back_to_nearest_points():
+    index = PlaceTagIndex([1, 2], ['POINT (0 0)', 'POINT (10 10)'])
+    mapping = index.assign(['a'], ['POINT (1 1)'])
+    assert mapping['place_tag'].isna().all()
+
+    nearest = PlaceTagIndex([1, 2], ['POINT (0 0)', 'POINT (10 10)'], nearest=True)
+    assert nearest.assign(['a'], ['POINT (1 1)'])['place_tag'].tolist() == [1]
+    assert nearest.version != index.version
@@ -0,0 +1,30 @@
+import numpy as np
+
+from places_api import PlacesClient
+from mock_places_server import MockPlacesServer
+
+
+def test_details_many_respects_qps():
+    qps = 20
+    with MockPlacesServer() as server:
+        client = PlacesClient('key', base_url=server.base_url, max_workers=8, qps=qps)
+        client.get_place_details_many([f'place-{i}' for i in range(10)])
+        times = np.sort([t for t, _, _ in server.requests])
+
+    # server side arrival times jitter, so check spans rather than single gaps
+    assert times[-1] - times[0] >= 9 / qps * 0.9
+    assert (times[5:] - times[:-5]).min() >= 5 / qps * 0.8
+
+
+def test_details_many_retries_over_query_limit_in_order():
+    place_ids = [f'place-{i}' for i in range(12)]
+    with MockPlacesServer(over_query_limit_ids=place_ids[::3]) as server:
+        client = PlacesClient(
+            'key', base_url=server.base_url, max_workers=4, qps=1000, backoff_seconds=0.01
+        )
+        results = client.get_place_details_many(place_ids)
+        n_requests = len(server.requests)
+
+    assert [content['status'] for content, _ in results] == ['OK'] * len(place_ids)
+    assert [content['result']['place_id'] for content, _ in results] == place_ids
+    assert n_requests == len(place_ids) + len(place_ids[::3])
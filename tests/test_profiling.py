@@ -0,0 +1,35 @@
+import json
+
+import pandas as pd
+
+from ranking.data_access import get_backend
+from ranking.profiling import profile_step
+
+
+class ExampleFlow():
+    @profile_step
+    def load_data(self):
+        backend = get_backend('test-profiling')
+        self.restaurant_df = backend.query("select * from restaurant_data.restaurants")
+
+
+def test_profile_step_with_local_backend(tmp_path, monkeypatch):
+    (tmp_path / 'data' / 'restaurant_data').mkdir(parents=True)
+    pd.DataFrame({'id': [1, 2, 3]}).to_parquet(
+        tmp_path / 'data' / 'restaurant_data' / 'restaurants.parquet'
+    )
+    monkeypatch.setenv('FOODIE_DATA_BACKEND', 'local')
+    monkeypatch.setenv('FOODIE_LOCAL_DATA_DIR', str(tmp_path / 'data'))
+    monkeypatch.setenv('FOODIE_METRICS_DIR', str(tmp_path / 'metrics'))
+
+    flow = ExampleFlow()
+    flow.load_data()
+
+    metrics = flow.step_metrics
+    assert metrics['step'] == 'load_data'
+    assert metrics['bq_jobs'] == 1
+    assert metrics['bq_rows_read'] == 0
+    assert metrics['artifact_rows'] == {'restaurant_df': 3}
+    metrics_files = list((tmp_path / 'metrics').glob('*/*/load_data-*.json'))
+    assert len(metrics_files) == 1
+    assert json.loads(metrics_files[0].read_text())['artifact_rows'] == {'restaurant_df': 3}
@@ -4,6 +4,9 @@ import os
 
 from google.cloud import bigquery
 
+from ranking.data_access import get_bigquery_client
+from ranking.profiling import profile_step
+
 
 class TableSetup(FlowSpec):
     """
@@ -22,6 +25,7 @@ class TableSetup(FlowSpec):
         )
 
     @step
+    @profile_step
     def create_prediction_dataset(self):
         """
         A step for creating prediction tables
@@ -31,8 +35,8 @@ class TableSetup(FlowSpec):
         add logic to allow piecewise rebuilding of tables if needed
         """
         project_id = os.environ['GCP_PROJECT']
-        # establish bigquery connection
-        bq_client = bigquery.Client(project=project_id)
+        # shared bigquery connection for this process
+        bq_client = get_bigquery_client(project_id)
 
         # create dataset
         dataset_id = "{}.predictions".format(bq_client.project)
@@ -70,14 +74,15 @@ class TableSetup(FlowSpec):
         self.next(self.join)
 
     @step
+    @profile_step
     def create_demo_landing_dataset(self):
         """
         A step for creating copies of demo tables
 
         """
         project_id = os.environ['GCP_PROJECT']
-        # establish bigquery connection
-        bq_client = bigquery.Client(project=project_id)
+        # shared bigquery connection for this process
+        bq_client = get_bigquery_client(project_id)
 
         # create dataset
         dataset_id = "{}.demo_data".format(bq_client.project)
@@ -4,10 +4,12 @@ import os
 import yaml
 import datetime
 
-from google.cloud import bigquery
-
-import pandas as pd
-import numpy as np
+from ranking.data_access import get_backend
+from ranking.feature_store import FeatureStoreClient
+from ranking.samplers import NeighborhoodSampler
+from ranking.profiling import profile_step
+from ranking.sharding import split_shards, shard_artifact, concat_shards
+from ranking.catalog import RestaurantCatalog, get_catalog_key
 
 
 class DailyRuleBasedNeighborhoodV0Flow(FlowSpec):
@@ -27,6 +29,13 @@ class DailyRuleBasedNeighborhoodV0Flow(FlowSpec):
         default="daily_rule_based_neighborhood_v0.yaml"
     )
 
+    n_shards = Parameter(
+        "n_shards",
+        help="Number of user shards to run inference on in parallel",
+        default=1,
+        type=int
+    )
+
     @step
     def start(self):
         """
@@ -41,45 +50,45 @@ class DailyRuleBasedNeighborhoodV0Flow(FlowSpec):
         self.next(self.load_data)
 
     @step
+    @profile_step
     def load_data(self):
         """
         A step for loading user impression data and restaurant list
 
         Notes:
-        -abstract out bigquery connection into seperate class
         -how to handle when training data is too big to fit into memory
         -down the line don't need to save data, pass reference?
         """
         project_id = os.environ['GCP_PROJECT']
-        # establish bigquery connection
-        bq_client = bigquery.Client(project=project_id)
-
-        user_query = """
-            select
-                user_id,
-                user_neighborhood_id
-            from warehouse_feature_store.user_sparse_neighborhood_id
-            where ds = (select max(ds) from warehouse_feature_store.user_sparse_neighborhood_id)
-        """
-
-        self.user_df = bq_client.query(
-            query=user_query
-        ).to_dataframe()
-
-        restaurant_query = """
-            select
-                restaurant_id,
-                restaurant_neighborhood_id,
-            from warehouse_feature_store.object_sparse_restaurant_neighborhood_id
-            where ds = (select max(ds) from warehouse_feature_store.object_sparse_restaurant_neighborhood_id)
-        """
-        self.restaurant_df = bq_client.query(
-            query=restaurant_query
-        ).to_dataframe()
-
-        self.next(self.inference)
+        # feature store snapshots are cached locally per (table, ds)
+        feature_store = FeatureStoreClient(project_id)
+        # optional ds to run on, defaults to the latest partition
+        feature_ds = self.config['params'].get('feature_ds')
+
+        user_df = feature_store.get(
+            'user_sparse_neighborhood_id',
+            columns=['user_id', 'user_neighborhood_id'],
+            ds=feature_ds
+        )
+        self.restaurant_df = feature_store.get(
+            'object_sparse_restaurant_neighborhood_id',
+            columns=['restaurant_id', 'restaurant_neighborhood_id'],
+            ds=feature_ds
+        )
+        # shards on the same host share one memory mapped copy of the catalog
+        self.catalog_key = get_catalog_key(
+            self.restaurant_df, 'restaurant_id', sort_by=['restaurant_neighborhood_id']
+        )
+
+        # hash partition users into one artifact per shard, each inference
+        # task only loads its own
+        self.shards = list(range(self.n_shards))
+        for shard, shard_df in enumerate(split_shards(user_df, 'user_id', self.n_shards)):
+            setattr(self, shard_artifact('user_df', shard), shard_df)
+        self.next(self.inference, foreach='shards')
 
     @step
+    @profile_step
     def inference(self):
         """
         A step for running inference
@@ -87,56 +96,51 @@ class DailyRuleBasedNeighborhoodV0Flow(FlowSpec):
         """
         n = int(self.config['params']['n'])
         n_in_zip_target = int(self.config['params']['n_in_zip'])
+        # optional seed for reproducible rec lists
+        seed = self.config['params'].get('seed')
+        if seed is not None:
+            seed = int(seed)
+
+        self.shard = self.input
+        user_df = getattr(self, shard_artifact('user_df', self.shard))
+
+        # TODO: filter on unseen restaurants in last X days
+        catalog = RestaurantCatalog.open_or_build(
+            self.catalog_key,
+            lambda: self.restaurant_df,
+            'restaurant_id',
+            sort_by=['restaurant_neighborhood_id']
+        )
+        sampler = NeighborhoodSampler.from_catalog(
+            catalog,
+            seed=None if seed is None else [seed, self.shard]
+        )
+        self.prediction_df = sampler.sample(
+            user_df,
+            n=n,
+            n_in_zip=n_in_zip_target
+        )
+        self.next(self.join)
 
-        prediction_list = []
-        for _, record in self.user_df.iterrows():
-            # get user info
-            user_id = record['user_id']
-            user_neighborhood_id = record['user_neighborhood_id']
-            # TODO: filter on unseen restaurants in last X days
-            eligible_restaurant_df = self.restaurant_df.copy(deep=True)
-            user_neighborhood_mask = \
-                eligible_restaurant_df['restaurant_neighborhood_id'] == user_neighborhood_id
-            # sample restaurants in neighborhood
-            in_neighborhood_restaurant_df = \
-                eligible_restaurant_df[user_neighborhood_mask]
-            n_in_neighborhood = min(
-                n_in_zip_target, 
-                in_neighborhood_restaurant_df.shape[0]
-            )
-            in_neighborhood_selection = \
-                in_neighborhood_restaurant_df['restaurant_id'] \
-                .sample(n_in_neighborhood).to_list()
-            # sample restaurants out of neighborhood
-            out_neighborhood_restaurant_df = \
-                eligible_restaurant_df[~user_neighborhood_mask]
-            n_out_neighborhood = min(
-                max(n - len(in_neighborhood_selection), n - n_in_zip_target),
-                out_neighborhood_restaurant_df.shape[0]
-            )
-            out_neighborhood_selection = \
-                out_neighborhood_restaurant_df['restaurant_id'] \
-                .sample(n_out_neighborhood).to_list()
-            # shuffle selection list
-            user_selection = \
-                in_neighborhood_selection + out_neighborhood_selection
-            np.random.shuffle(user_selection)
-            # append to output
-            prediction_list.append({
-                'user_id': user_id,
-                'restaurant_list': user_selection
-            })
-        self.prediction_df = pd.DataFrame(prediction_list)
+    @step
+    @profile_step
+    def join(self, inputs):
+        """
+        A step to collect the predictions of every user shard
+        """
+        self.prediction_df = concat_shards(inputs, 'prediction_df')
+        self.merge_artifacts(inputs, exclude=['prediction_df', 'shard', 'step_metrics'])
         self.next(self.save)
 
     @step
+    @profile_step
     def save(self):
         """
         A step to save predictions
         """
         project_id = os.environ['GCP_PROJECT']
-        # establish bigquery connection
-        bq_client = bigquery.Client(project=project_id)
+        # shared data backend for this process
+        backend = get_backend(project_id)
         ds = datetime.date.today()
         destination_table = self.config['data']['prediction_table']
         # check that prediction doesn't exist for day
@@ -145,7 +149,7 @@ class DailyRuleBasedNeighborhoodV0Flow(FlowSpec):
                 max(ds)
             from {destination_table}
         """
-        pred_check = bq_client.query(query=pred_check_query).to_dataframe()
+        pred_check = backend.query(pred_check_query)
         if pred_check.iloc[0][0] != ds:
             # prepare prediction_df for upload
             self.prediction_df['ds'] = ds
@@ -190,11 +194,10 @@ class DailyRuleBasedNeighborhoodV0Flow(FlowSpec):
                     "mode": "NULLABLE"
                 },
             ]
-            self.prediction_df.to_gbq(
+            backend.write_dataframe(
+                self.prediction_df,
                 destination_table,
-                project_id=project_id,
-                if_exists='append',
-                table_schema=table_schema
+                schema=table_schema
             )
         else:
             print(f"{ds} already exists")
@@ -5,12 +5,17 @@ import yaml
 import datetime
 import json
 
-from google.cloud import bigquery
 from google.oauth2 import service_account
 
 import pandas as pd
 import numpy as np
 
+from ranking.data_access import get_backend
+from ranking.samplers import sample_from_pools
+from ranking.profiling import profile_step
+from ranking.sharding import split_shards, shard_artifact, concat_shards
+from ranking.catalog import RestaurantCatalog, get_catalog_key
+
 
 class SMSDailyRecFlow(FlowSpec):
     """
@@ -20,6 +25,13 @@ class SMSDailyRecFlow(FlowSpec):
         Randomly select from restaurants that user has not seen before
     """
 
+    n_shards = Parameter(
+        "n_shards",
+        help="Number of user shards to run inference on in parallel",
+        default=1,
+        type=int
+    )
+
     @step
     def start(self):
         """
@@ -31,26 +43,25 @@ class SMSDailyRecFlow(FlowSpec):
         self.next(self.load_data)
 
     @step
+    @profile_step
     def load_data(self):
         """
         A step for loading user impression data and restaurant list
         """
         project_id = os.environ['GCP_PROJECT']
-        # establish bigquery connection
-        bq_client = bigquery.Client(project=project_id)
+        # shared data backend for this process
+        backend = get_backend(project_id)
         print(os.environ['GOOGLE_APPLICATION_CREDENTIALS'])
+        # unseen restaurants per user, precomputed by dbt
         user_query = """
             select
-              a.id as user_id,
-              engagement_sms_impression_restaurant_list
-            from application.dim_user a
-            left join warehouse_feature_generation.application_engagement_features_v2 b
-            on a.id = b.user_id
+              user_id,
+              candidate_restaurant_ids
+            from warehouse_inference_candidates.sms_daily_rec_candidates
+            where ds = (select max(ds) from warehouse_inference_candidates.sms_daily_rec_candidates)
 
         """
-        self.user_df = bq_client.query(
-            query=user_query
-        ).to_dataframe()
+        user_df = backend.query(user_query)
 
         restaurant_query = """
             select
@@ -59,58 +70,73 @@ class SMSDailyRecFlow(FlowSpec):
             from application.dim_restaurant
 
         """
-        self.restaurant_df = bq_client.query(
-            query=restaurant_query
-        ).to_dataframe()
+        self.restaurant_df = backend.query(restaurant_query)
+        # shards on the same host share one memory mapped copy of the catalog
+        self.catalog_key = get_catalog_key(self.restaurant_df, 'id')
 
-        self.next(self.inference)
+        # hash partition users into one artifact per shard, each inference
+        # task only loads its own
+        self.shards = list(range(self.n_shards))
+        for shard, shard_df in enumerate(split_shards(user_df, 'user_id', self.n_shards)):
+            setattr(self, shard_artifact('user_df', shard), shard_df)
+        self.next(self.inference, foreach='shards')
 
     @step
+    @profile_step
     def inference(self):
         """
         A step for running inference
 
         """
-        # generate predictions for each user
-        prediction_list = []
-        for _, record in self.user_df.iterrows():
-            user_id = record['user_id']
-            engaged_list = record['engagement_sms_impression_restaurant_list']
-            eligibility_mask = ~self.restaurant_df['id'].isin(engaged_list)
-            prediction = self.restaurant_df[eligibility_mask].sample(1).iloc[0]
-            prediction_list.append({
-                'ts' : pd.Timestamp.now(),
-                'user' : user_id,
-                'restaurant_id' :prediction['id'],
-                'name' :prediction['name']
-            })
-        self.prediction_df = pd.DataFrame(prediction_list)
+        self.shard = self.input
+        user_df = getattr(self, shard_artifact('user_df', self.shard))
+        # generate predictions for all users of the shard at once
+        rng = np.random.default_rng()
+        restaurant_ids = sample_from_pools(
+            user_df['candidate_restaurant_ids'], 1, rng
+        )[:, 0]
+        catalog = RestaurantCatalog.open_or_build(
+            self.catalog_key, lambda: self.restaurant_df, 'id'
+        )
+        self.prediction_df = pd.DataFrame({
+            'ts': pd.Timestamp.now(),
+            'user': user_df['user_id'].to_numpy(),
+            'restaurant_id': restaurant_ids,
+            'name': catalog.decode('name', catalog.positions(restaurant_ids)),
+        })
+        self.next(self.join)
+
+    @step
+    @profile_step
+    def join(self, inputs):
+        """
+        A step to collect the predictions of every user shard
+        """
+        self.prediction_df = concat_shards(inputs, 'prediction_df')
+        self.merge_artifacts(inputs, exclude=['prediction_df', 'shard', 'step_metrics'])
         self.next(self.save)
 
     @step
+    @profile_step
     def save(self):
         """
         A step to save predictions
         """
         project_id = os.environ['GCP_PROJECT']
-        # establish bigquery connection
-        bq_client = bigquery.Client(project=project_id)
+        # shared data backend for this process
+        backend = get_backend(project_id)
 
-        
         # upload prediction
         dataset_id = 'inference'
         table_id = 'sms_daily_rec_predictions'
 
-        # tell the client everything it needs to know to upload our csv
-        dataset_ref = bq_client.dataset(dataset_id)
-        table_ref = dataset_ref.table(table_id)
-        # Configure the job to overwrite the table if it already exists
-        job_config = bigquery.LoadJobConfig()
-        job_config.write_disposition = 'WRITE_APPEND'
-
         # Upload the DataFrame to BigQuery
         out_df = self.prediction_df
-        job = bq_client.load_table_from_dataframe(out_df, table_ref, job_config=job_config)
+        backend.write_dataframe(
+            out_df,
+            f'{dataset_id}.{table_id}',
+            write_disposition='WRITE_APPEND'
+        )
 
         self.next(self.end)
 
@@ -5,12 +5,16 @@ import yaml
 import datetime
 import json
 
-from google.cloud import bigquery
 from google.oauth2 import service_account
 
 import pandas as pd
 import numpy as np
 
+from ranking.data_access import get_backend
+from ranking.samplers import sample_from_pools
+from ranking.profiling import profile_step
+from ranking.sharding import split_shards, shard_artifact, concat_shards
+
 
 class SMSImpressionQualityFlow(FlowSpec):
     """
@@ -21,6 +25,13 @@ class SMSImpressionQualityFlow(FlowSpec):
         and 4.9 that have not been shown in last 2 prediction lists
     """
 
+    n_shards = Parameter(
+        "n_shards",
+        help="Number of user shards to run inference on in parallel",
+        default=1,
+        type=int
+    )
+
     @step
     def start(self):
         """
@@ -32,106 +43,98 @@ class SMSImpressionQualityFlow(FlowSpec):
         self.next(self.load_data)
 
     @step
+    @profile_step
     def load_data(self):
         """
         A step for loading user impression data and restaurant list
         """
         project_id = os.environ['GCP_PROJECT']
-        # establish bigquery connection
-        bq_client = bigquery.Client(project=project_id)
+        # shared data backend for this process
+        backend = get_backend(project_id)
         print(os.environ['GOOGLE_APPLICATION_CREDENTIALS'])
+        # unseen restaurants rated 4.5 to 4.9 per user, precomputed by dbt
         user_query = """
             select
-              a.user_id,
-              engagement_sms_impression_restaurant_last_2_prediction_lists
-            from application.user a
-            left join warehouse_feature_generation.application_engagement_features b
-            on a.user_id = b.user_id
-
-        """
-        self.user_df = bq_client.query(
-            query=user_query
-        ).to_dataframe()
-
-        restaurant_query = """
-            select
-                a.id,
-                c.restaurant_google_rating_float
-            from application.restaurant a
-            left join restaurant_data.google_maps_application_id_mapping b
-            on a.id = b.application_id
-            left join warehouse_feature_generation.google_maps_basic_features c
-            on b.google_maps_id = c.restaurant_id
+              user_id,
+              candidate_restaurant_ids
+            from warehouse_inference_candidates.sms_impression_quality_candidates
+            where ds = (select max(ds) from warehouse_inference_candidates.sms_impression_quality_candidates)
 
         """
-        self.restaurant_df = bq_client.query(
-            query=restaurant_query
-        ).to_dataframe()
+        user_df = backend.query(user_query)
 
         prediction_query = """
             select
                 max(prediction_id) as predcition_id
             from inference.predictions
         """
-        self.prediction_id = bq_client.query(
-            query=prediction_query
-        ).to_dataframe().iloc[0][0] + 1
+        self.prediction_id = backend.query(
+            prediction_query
+        ).iloc[0][0] + 1
 
-        self.next(self.inference)
+        # hash partition users into one artifact per shard, each inference
+        # task only loads its own
+        self.shards = list(range(self.n_shards))
+        for shard, shard_df in enumerate(split_shards(user_df, 'user_id', self.n_shards)):
+            setattr(self, shard_artifact('user_df', shard), shard_df)
+        self.next(self.inference, foreach='shards')
 
     @step
+    @profile_step
     def inference(self):
         """
         A step for running inference
 
         """
-        # get eligible restaurant list
-        eligibility_mask = (self.restaurant_df['restaurant_google_rating_float'] >= 4.5) \
-            & (self.restaurant_df['restaurant_google_rating_float'] <= 4.9)
-        restaurant_list = self.restaurant_df[eligibility_mask]['id']
-        print(restaurant_list.shape)
-        # generate predictions for each user
-        prediction_list = []
-        for _, record in self.user_df.iterrows():
-            user_id = record['user_id']
-            engaged_list = record['engagement_sms_impression_restaurant_last_2_prediction_lists']
-            predictions = restaurant_list[~restaurant_list.isin(engaged_list)].sample(5).tolist()
-            prediction_list.append({
-                'user_id':user_id,
-                'restaurant_id_list':predictions
-            })
-        self.prediction_df = pd.DataFrame(prediction_list)
+        self.shard = self.input
+        user_df = getattr(self, shard_artifact('user_df', self.shard))
+        # generate predictions for all users of the shard at once
+        rng = np.random.default_rng()
+        restaurant_ids = sample_from_pools(
+            user_df['candidate_restaurant_ids'], 5, rng
+        )
+        self.prediction_df = pd.DataFrame({
+            'user_id': user_df['user_id'].to_numpy(),
+            'restaurant_id_list': restaurant_ids.tolist(),
+        })
         self.prediction_df['prediction_ts'] = pd.Timestamp.now()
         self.prediction_df['model_id'] = 1
         self.prediction_df['prediction_id'] = self.prediction_id
         self.prediction_df['restaurant_id_list'] = \
             self.prediction_df['restaurant_id_list'].apply(lambda x: json.dumps(x))
+        self.next(self.join)
+
+    @step
+    @profile_step
+    def join(self, inputs):
+        """
+        A step to collect the predictions of every user shard
+        """
+        self.prediction_df = concat_shards(inputs, 'prediction_df')
+        self.merge_artifacts(inputs, exclude=['prediction_df', 'shard', 'step_metrics'])
         self.next(self.save)
 
     @step
+    @profile_step
     def save(self):
         """
         A step to save predictions
         """
         project_id = os.environ['GCP_PROJECT']
-        # establish bigquery connection
-        bq_client = bigquery.Client(project=project_id)
+        # shared data backend for this process
+        backend = get_backend(project_id)
 
-        
         # upload prediction
         dataset_id = 'inference'
         table_id = 'predictions'
 
-        # tell the client everything it needs to know to upload our csv
-        dataset_ref = bq_client.dataset(dataset_id)
-        table_ref = dataset_ref.table(table_id)
-        # Configure the job to overwrite the table if it already exists
-        job_config = bigquery.LoadJobConfig()
-        job_config.write_disposition = 'WRITE_APPEND'
-
         # Upload the DataFrame to BigQuery
         out_df = self.prediction_df
-        job = bq_client.load_table_from_dataframe(out_df, table_ref, job_config=job_config)
+        backend.write_dataframe(
+            out_df,
+            f'{dataset_id}.{table_id}',
+            write_disposition='WRITE_APPEND'
+        )
 
         self.next(self.end)
 
@@ -2,17 +2,12 @@ from metaflow import FlowSpec, step, IncludeFile, Parameter
 
 import os
 import yaml
-import time
-import pickle
-
-from google.cloud import bigquery
-from google.cloud import storage
-
-import pandas as pd
 
 import ranking
 from ranking.utils import get_model_from_config_spec
-from ranking.constants import MODEL_STORE
+from ranking.registry import ModelRegistry
+from ranking.training_data import TrainingDataReference
+from ranking.profiling import profile_step
 
 class TrainFlow(FlowSpec):
     """
@@ -37,38 +32,29 @@ class TrainFlow(FlowSpec):
         self.next(self.load_data)
 
     @step
+    @profile_step
     def load_data(self):
         """
         A step for loading training data
 
-        Notes:
-        -abstract out bigquery connection into seperate class
-        -how to handle when training data is too big to fit into memory
-        -down the line don't need to save data, pass reference?
+        Only a reference to the training data is stored as an artifact, rows
+        are streamed per ds partition while the model trains, from a local
+        cache that only fetches new or changed partitions
         """
         project_id = os.environ['GCP_PROJECT']
-        # establish bigquery connection
-        bq_client = bigquery.Client(project=project_id)
-
-        # load training data per config
-        training_table = self.config['data']['table']
-        training_start_ds = self.config['data']['start_ds']
-        training_end_ds = self.config['data']['end_ds']
-        query = f"""
-            select 
-                * 
-            from warehouse_training_tables.{training_table}
-            where ds >= '{training_start_ds}'
-                and ds <= '{training_end_ds}'
-        """
 
-        self.train_df = bq_client.query(
-            query=query
-        ).to_dataframe()
+        # reference training data per config
+        self.train_data = TrainingDataReference(
+            table=self.config['data']['table'],
+            start_ds=self.config['data']['start_ds'],
+            end_ds=self.config['data']['end_ds'],
+            project_id=project_id,
+        )
 
         self.next(self.train_model)
 
     @step
+    @profile_step
     def train_model(self):
         """
         A step for training model
@@ -79,15 +65,12 @@ class TrainFlow(FlowSpec):
         """
         model_arch = self.config['model']['model_arch']
         model = get_model_from_config_spec(model_arch)
-        model.fit(self.train_df)
-        # save trained model to model store        
-        storage_client = storage.Client()
-        bucket = storage_client.get_bucket(MODEL_STORE)
-        ts = int(time.time())
-        self.model_save_path = f"{self.config['model']['model_arch'].lower()}_{ts}.pickle"
-        blob = bucket.blob(self.model_save_path)
-        serialized_model = pickle.dumps(model)
-        blob.upload_from_string(serialized_model)
+        model.fit_batches(
+            self.train_data.iter_batches(columns=model.feature_columns)
+        )
+        # save trained model to model store
+        registry = ModelRegistry()
+        self.model_save_path = registry.register(model, model_arch)
         
         self.next(self.end)
 